@@ -0,0 +1,184 @@
+"""Versioned JSON API for handheld clients at ``/api/v1``.
+
+The pages render full HTML from ``SELECT *``, so a phone checking a stock
+level downloaded every description and image path plus the markup around
+them. The API returns only data, and only the columns asked for:
+
+- ``GET /api/v1/items``, ``/sales``, ``/wages`` - newest first, one page at
+  a time with the keyset cursors from pagination.py (``after``/``before``
+  tokens, ``per_page`` up to 200). Sales take ``start``/``end``,
+  ``item`` and ``seller``; wages take ``start``/``end`` and ``employee``.
+- ``GET /api/v1/investors`` - investor balances (admin only)
+- ``GET /api/v1/dashboard`` - the dashboard numbers and today's sales
+
+``fields=name,quantity`` selects columns. The list becomes the SELECT's
+column list, so unrequested columns are never read, and an unknown field
+is a 400 listing the valid ones. Responses are compact JSON
+``{"data": ..., "next": ..., "prev": ...}`` with ETags from http_cache,
+so an unchanged list costs a 304.
+
+Clients sign in through ``/auth/login`` and send the session cookie.
+"""
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, request, session
+
+import http_cache
+import ledger
+import pagination
+import sqlite_db
+import stock_alerts
+
+API_PREFIX = '/api/v1'
+
+# name -> (table, order column, fields, default fields, {query argument: filter column}, dated)
+RESOURCES = {
+    'items': ('stock_items', 'id',
+              ('id', 'name', 'quantity', 'initial_quantity', 'selling_price', 'description', 'image_path',
+               'thumb_path', 'current_stock_value', 'reorder_level', 'created_at'),
+              ('id', 'name', 'quantity', 'selling_price'),
+              {}, False),
+    'sales': ('sales', 'sold_at',
+              ('id', 'item_id', 'item_name', 'quantity_sold', 'selling_price', 'total_amount', 'image_path',
+               'thumb_path', 'user_id', 'user_name', 'user_email', 'place', 'sold_at'),
+              ('id', 'item_id', 'item_name', 'quantity_sold', 'total_amount', 'sold_at'),
+              {'item': 'item_id', 'seller': 'user_id'}, True),
+    'wages': ('wages', 'created_at',
+              ('id', 'employee_name', 'amount', 'wage_type', 'description', 'created_at'),
+              ('id', 'employee_name', 'amount', 'wage_type', 'created_at'),
+              {'employee': 'employee_name'}, True),
+}
+
+INVESTOR_FIELDS = ('name', 'email', 'phone', 'total_invested', 'total_withdrawn', 'balance',
+                   'transaction_count', 'updated_at')
+INVESTOR_DEFAULT_FIELDS = ('name', 'balance', 'transaction_count')
+INVESTOR_COLUMNS = {'name': 'investor_name', 'email': 'investor_email', 'phone': 'investor_phone'}
+
+SUMMARY_FIELDS = ('total_items', 'total_quantity', 'current_stock_value', 'expected_revenue')
+TODAY_FIELDS = ('sales_today', 'units_today', 'revenue_today')
+DASHBOARD_FIELDS = SUMMARY_FIELDS + TODAY_FIELDS + ('low_stock_alerts', 'net_investment')
+
+bp = Blueprint('api_v1', __name__, url_prefix=API_PREFIX)
+
+
+class FieldError(ValueError):
+    """A fields= argument named a field the resource does not have"""
+
+    def __init__(self, unknown, allowed):
+        super().__init__(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+
+
+def requested_fields(value, allowed, default):
+    """The fields named in a fields= argument, in the order given; raises FieldError"""
+    if not value:
+        return list(default)
+    fields = list(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise FieldError(unknown, allowed)
+    return fields or list(default)
+
+
+def list_resource(cursor, name, args):
+    """One page of a RESOURCES list, reading only the requested columns"""
+    table, order_column, allowed, default, filters, dated = RESOURCES[name]
+    fields = requested_fields(args.get('fields'), allowed, default)
+    # The cursor needs the row's position even when the client did not ask for it
+    columns = list(dict.fromkeys(fields + [order_column, 'id']))
+
+    page_args = pagination.page_args(args)
+    if not dated:
+        page_args['start_date'] = page_args['end_date'] = None
+    page = pagination.fetch_page(cursor, table, order_column, ', '.join(columns),
+                                 filters={column: args[argument] for argument, column in filters.items()
+                                          if args.get(argument)},
+                                 **page_args)
+    return {'data': [{field: row[field] for field in fields} for row in page['rows']],
+            'next': page['next_cursor'], 'prev': page['prev_cursor']}
+
+
+def list_investors(cursor, args):
+    """Investor balances by name, reading only the requested columns"""
+    fields = requested_fields(args.get('fields'), INVESTOR_FIELDS, INVESTOR_DEFAULT_FIELDS)
+    columns = list(dict.fromkeys(['name'] + fields))
+    page_size = pagination.page_size_from(args.get('per_page'))
+    after = pagination.decode_cursor(args.get('after'))
+
+    where, params = ('WHERE investor_name > ?', [after[0]]) if after else ('', [])
+    cursor.execute(f'''
+        SELECT {', '.join(f'{INVESTOR_COLUMNS.get(c, c)} AS {c}' for c in columns)}
+        FROM investor_balances {where}
+        ORDER BY investor_name
+        LIMIT ?
+    ''', params + [page_size + 1])
+    rows = cursor.fetchall()
+    # Names are the key, so the cursor's id part is unused
+    next_cursor = pagination.encode_cursor(rows[page_size - 1]['name'], 0) if len(rows) > page_size else None
+    return {'data': [{field: row[field] for field in fields} for row in rows[:page_size]],
+            'next': next_cursor, 'prev': None}
+
+
+def dashboard_stats(cursor, args, is_admin):
+    """The dashboard numbers; only the queries behind the requested fields are run"""
+    allowed = DASHBOARD_FIELDS if is_admin else DASHBOARD_FIELDS[:-1]
+    fields = requested_fields(args.get('fields'), allowed, allowed)
+    stats = {}
+
+    summary_fields = [f for f in fields if f in SUMMARY_FIELDS]
+    if summary_fields:
+        cursor.execute(f"SELECT {', '.join(summary_fields)} FROM inventory_summary WHERE id = 1")
+        row = cursor.fetchone()
+        stats.update({f: row[f] if row else 0 for f in summary_fields})
+
+    if any(f in TODAY_FIELDS for f in fields):
+        cursor.execute('''
+            SELECT COALESCE(SUM(sales_count), 0), COALESCE(SUM(units), 0), COALESCE(SUM(revenue), 0)
+            FROM sales_daily WHERE day = ?
+        ''', (datetime.utcnow().strftime('%Y-%m-%d'),))
+        stats.update(zip(TODAY_FIELDS, cursor.fetchone()))
+
+    if 'low_stock_alerts' in fields:
+        stats['low_stock_alerts'] = stock_alerts.alert_count(cursor)
+    if 'net_investment' in fields:
+        stats['net_investment'] = ledger.get_net_investment(cursor)
+    return {'data': {f: stats[f] for f in fields}}
+
+
+def _json(payload, status=200):
+    # No whitespace between tokens; the compression middleware does the rest
+    return Response(json.dumps(payload, separators=(',', ':'), default=str), status=status,
+                    mimetype='application/json')
+
+
+def _endpoint(build, admin_only=False):
+    def view():
+        if 'user_id' not in session:
+            return _json({'error': 'Login required'}, 401)
+        is_admin = session.get('username') == 'admin'
+        if admin_only and not is_admin:
+            return _json({'error': 'Admin privileges required'}, 403)
+        try:
+            return _json(build(sqlite_db.get_db().cursor(), request.args, is_admin))
+        except FieldError as e:
+            return _json({'error': str(e)}, 400)
+    return view
+
+
+def _register(name, tables, build, admin_only=False, daily=False):
+    view = _endpoint(build, admin_only)
+    view.__name__ = name
+    bp.add_url_rule(f'/{name}', name, http_cache.conditional(*tables, daily=daily)(view))
+
+
+for _name, _spec in RESOURCES.items():
+    _register(_name, (_spec[0],), lambda cursor, args, is_admin, name=_name: list_resource(cursor, name, args))
+_register('investors', ('investor_balances',), lambda cursor, args, is_admin: list_investors(cursor, args),
+          admin_only=True)
+# The summary and alerts change with stock, today's figures with sales and the date
+_register('dashboard', ('stock_items', 'sales', 'investor_balances'), dashboard_stats, daily=True)
+
+
+def init_app(app):
+    """Serve the API under /api/v1"""
+    app.register_blueprint(bp)
@@ -1,25 +1,57 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-from database import execute_query, init_database, test_connection
+from database import execute_query, init_database, test_connection, pool_stats, close_pool
+import assets
+import compression
+import exports
+import item_search
 
-app = Flask(__name__)
-print("Flask app created successfully")
-# Configuration
-app.secret_key = os.environ.get('SECRET_KEY', 'stock-monitor-secret-2024-chethan81-production-key-1234567890')
+def create_app(migrate=True):
+    """Build the app.
+
+    Everything made here is immutable and shared: config, routes, the asset
+    manifest and compiled templates. No database connection outlives this
+    call, so under ``gunicorn --preload`` it runs once in the master and the
+    workers fork with warm, copy-on-write state; each worker opens its own
+    pool on its first query.
+    """
+    app = Flask(__name__)
+    # Configuration
+    app.secret_key = os.environ.get('SECRET_KEY', 'stock-monitor-secret-2024-chethan81-production-key-1234567890')
+    assets.init_app(app)
+    compression.init_app(app)
+    exports.init_app(app, dialect='mysql')
+    item_search.init_app(app, dialect='mysql')
+
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/test', 'test', test)
+    app.add_url_rule('/health/db', 'health_db', health_db)
+    app.add_url_rule('/login', 'login', login)
+    app.add_url_rule('/dashboard', 'dashboard', dashboard)
+
+    # Compile every template now instead of in each worker on first render
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+    if migrate:
+        prepare_database()
+    return app
 
-# Initialize database on startup (with better error handling)
-# Railway MySQL integration - v2 - port fix
-try:
-    print("Starting database initialization...")
-    init_database()
-    print("Database initialized successfully")
-except Exception as e:
-    print(f"Database initialization failed: {e}")
-    print("App will continue without database - basic routes will work")
+def prepare_database():
+    """Apply pending migrations, then close the connection used so none crosses fork()"""
+    # Railway MySQL integration - v2 - port fix
+    try:
+        print("Starting database initialization...")
+        init_database()
+        print("Database initialized successfully")
+    except Exception as e:
+        print(f"Database initialization failed: {e}")
+        print("App will continue without database - basic routes will work")
+    finally:
+        close_pool()
 
-@app.route('/')
 def index():
     try:
         # Try to get dashboard stats if database works
@@ -47,7 +79,6 @@ def index():
         <p><strong>Status:</strong> ❌ Database Error: {str(e)}</p>
         '''
 
-@app.route('/test')
 def test():
     try:
         if test_connection():
@@ -72,7 +103,11 @@ def test():
         <p><a href="/">Back to Home</a></p>
         '''
 
-@app.route('/login')
+def health_db():
+    # Connection pool stats; 503 while the circuit breaker keeps MySQL off
+    stats = pool_stats()
+    return jsonify(stats), (503 if stats['breaker'] == 'open' else 200)
+
 def login():
     return '''
     <h1>Login page - basic version working!</h1>
@@ -82,7 +117,6 @@ def login():
     <a href="/dashboard" style="background-color: #28a745; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Dashboard</a>
     '''
 
-@app.route('/dashboard')
 def dashboard():
     return '''
     <h1>Dashboard - basic version working!</h1>
@@ -90,6 +124,9 @@ def dashboard():
     <p><a href="/">Back to Home</a></p>
     '''
 
+app = create_app()
+print("Flask app created successfully")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))  # Render expects port 10000
     app.run(host='0.0.0.0', port=port)
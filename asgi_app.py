@@ -0,0 +1,299 @@
+"""ASGI entry point: async versions of the hot routes, Flask for the rest.
+
+Under ``gunicorn app:app`` each sync worker is tied up for the whole of a
+request, including the MySQL round trips and the deliberately slow
+``check_password_hash``, so a handful of clerks logging in or typing in
+the search box at once queue behind each other. This app serves the
+routes every clerk hits constantly as coroutines over async_database.py:
+
+- ``POST /auth/login`` - the user lookup is awaited and the password hash
+  runs on a worker thread, so the event loop keeps serving while it works
+- ``GET /search/autocomplete?q=`` - the same query as item_search.py
+- ``GET /health/db`` - async pool statistics
+
+Sessions are Flask's signed cookie, read and written with the same secret
+key, so a login here is a login everywhere. Every other request is handed
+to the WSGI app named by ``ASGI_FALLBACK_APP`` on a worker thread, its
+response streamed back chunk by chunk. There is no default: it has to be
+the app for the same database as ``ASYNC_DB_BACKEND`` (``app:app`` for
+MySQL, ``stable_app:app`` for SQLite), and startup fails without it.
+
+Bodies over ``MAX_CONTENT_LENGTH`` get 413 as soon as the declared
+Content-Length or the bytes received so far pass it.
+
+Pending migrations are applied at ASGI lifespan startup. Run with any
+ASGI server, e.g. ``gunicorn asgi_app:app -k uvicorn.workers.UvicornWorker``.
+"""
+import asyncio
+import importlib
+import io
+import json
+import os
+import sys
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from flask import Flask
+from werkzeug.security import check_password_hash
+
+import async_database
+import item_search
+from mysql_pool import PoolError
+
+FALLBACK_APP = os.environ.get('ASGI_FALLBACK_APP', '')
+# The Flask apps' own MAX_CONTENT_LENGTH
+MAX_CONTENT_LENGTH = int(os.environ.get('ASGI_MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+
+# Only used to sign and read the session cookie the Flask apps share
+_flask = Flask(__name__)
+_flask.secret_key = os.environ.get('SECRET_KEY', 'stock-monitor-secret-2024-chethan81-production-key-1234567890')
+_serializer = _flask.session_interface.get_signing_serializer(_flask)
+SESSION_COOKIE = _flask.config['SESSION_COOKIE_NAME']
+SESSION_MAX_AGE = int(_flask.permanent_session_lifetime.total_seconds())
+
+
+class BodyTooLarge(Exception):
+    """The request body is over MAX_CONTENT_LENGTH"""
+
+
+class Request:
+    """The parts of an ASGI HTTP request the async routes read"""
+
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.body = body
+        self.args = {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        cookies = SimpleCookie(self.headers.get('cookie', ''))
+        self.session = _load_session(cookies[SESSION_COOKIE].value if SESSION_COOKIE in cookies else None)
+
+    @property
+    def form(self):
+        # Undecodable bytes become U+FFFD, as Werkzeug does, rather than a 500
+        body = self.body.decode('utf-8', errors='replace')
+        return {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+
+
+def _load_session(value):
+    if not value:
+        return {}
+    try:
+        return dict(_serializer.loads(value, max_age=SESSION_MAX_AGE))
+    except Exception:  # bad signature or expired: start a fresh session, as Flask does
+        return {}
+
+
+def _session_cookie(session):
+    value = _serializer.dumps(session)
+    return f'{SESSION_COOKIE}={value}; HttpOnly; Path=/'
+
+
+async def _respond(send, status, body=b'', content_type='text/plain; charset=utf-8', headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode()),
+                            (b'content-length', str(len(body)).encode())]
+                + [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _json(send, payload, status=200):
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    await _respond(send, status, body, 'application/json')
+
+
+async def _redirect(send, location, session=None):
+    headers = [('location', location)]
+    if session is not None:
+        headers.append(('set-cookie', _session_cookie(session)))
+    await _respond(send, 302, headers=headers)
+
+
+async def auth_login(request, send):
+    form = request.form
+    username, password = form.get('username', ''), form.get('password', '')
+    user = await async_database.execute_query(
+        'SELECT id, username, email, password_hash FROM users WHERE username = %s', (username,), fetch_one=True)
+
+    # The hash is CPU-bound on purpose; keep it off the event loop
+    session = request.session
+    if user and await asyncio.to_thread(check_password_hash, user['password_hash'], password):
+        session.update(user_id=user['id'], username=user['username'], user_email=user['email'] or '')
+        session.setdefault('_flashes', []).append(('success', 'Login successful!'))
+        return await _redirect(send, '/dashboard', session)
+    session.setdefault('_flashes', []).append(('error', 'Invalid username or password'))
+    await _redirect(send, '/login', session)
+
+
+async def search_autocomplete(request, send):
+    if 'user_id' not in request.session:
+        return await _json(send, {'error': 'Login required'}, 401)
+    try:
+        limit = int(request.args.get('limit', item_search.AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = item_search.AUTOCOMPLETE_LIMIT
+    limit = min(max(1, limit), item_search.RESULTS_PER_PAGE)
+
+    words = item_search.terms(request.args.get('q', ''))
+    if not words:
+        return await _json(send, [])
+    columns = item_search.SUGGESTION_COLUMNS
+    if async_database.BACKEND == 'sqlite':
+        sql, params = item_search.sqlite_sql(columns), (item_search.fts_query(words, 'name'), limit, 0)
+    else:
+        sql, params = item_search.mysql_sql(columns, words, 'name', limit)
+    rows = await async_database.execute_query(sql, params, fetch_all=True)
+    await _json(send, [{c: row.get(c) for c in columns} for row in rows])
+
+
+async def health_db(request, send):
+    # 503 while the circuit breaker keeps MySQL off
+    stats = async_database.pool_stats()
+    await _json(send, stats, 503 if stats['breaker'] == 'open' else 200)
+
+
+ROUTES = {
+    ('POST', '/auth/login'): auth_login,
+    ('GET', '/search/autocomplete'): search_autocomplete,
+    ('GET', '/health/db'): health_db,
+}
+
+
+_fallback = None
+
+
+def _fallback_app():
+    global _fallback
+    if _fallback is None:
+        if not FALLBACK_APP:
+            raise RuntimeError('Set ASGI_FALLBACK_APP to the WSGI app for this database, '
+                               'e.g. app:app (MySQL) or stable_app:app (SQLite)')
+        module, _, name = FALLBACK_APP.partition(':')
+        _fallback = getattr(importlib.import_module(module), name or 'app')
+    return _fallback
+
+
+def _wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def call_wsgi(scope, body, send):
+    """Run the fallback WSGI app on a worker thread and stream its response"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    def begin():
+        environ = _wsgi_environ(scope, body)
+        result = _fallback_app()(environ, start_response)
+        return result, iter(result)
+
+    result, chunks = await asyncio.to_thread(begin)
+    try:
+        # The first chunk may be what calls start_response
+        chunk = await asyncio.to_thread(next, chunks, None)
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await asyncio.to_thread(next, chunks, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'):
+            await asyncio.to_thread(result.close)
+
+
+async def _read_body(scope, receive):
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length' and value.isdigit() and int(value) > MAX_CONTENT_LENGTH:
+            raise BodyTooLarge()  # before reading any of it
+
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        if len(body) + len(chunk) > MAX_CONTENT_LENGTH:
+            raise BodyTooLarge()
+        body += chunk
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Load the fallback app now so a missing or wrong ASGI_FALLBACK_APP stops startup
+            try:
+                await asyncio.to_thread(_fallback_app)
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            # Without this a fresh SQLite file has no tables until the fallback app is imported
+            try:
+                await async_database.init_database()
+            except Exception as e:
+                print(f"Database initialization failed: {e}")
+                print("App will continue without database - basic routes will work")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_database.close_pool()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    try:
+        body = await _read_body(scope, receive)
+    except BodyTooLarge:
+        return await _respond(send, 413, b'Request body too large')
+    if body is None:
+        return  # the client went away
+
+    route = ROUTES.get((scope['method'], scope['path']))
+    if route is None:
+        return await call_wsgi(scope, body, send)
+    try:
+        await route(Request(scope, body), send)
+    except (PoolError,) + async_database.Error as e:
+        print(f"Async route error on {scope['path']}: {e}")
+        await _json(send, {'error': 'Database unavailable'}, 503)
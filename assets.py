@@ -0,0 +1,143 @@
+"""Fingerprinted, precompressed static assets.
+
+The shared stylesheet used to be inlined in ``base.html`` and so was
+re-sent with every page. It now lives in ``static/css/``. ``build()``
+copies each file under ``static/css`` and ``static/js`` to
+``static/dist/<name>.<hash>.<ext>``, where the hash is taken from its
+contents, and writes gzip (and, when the ``brotli`` package is installed,
+brotli) copies next to it. Because a changed file gets a new name, the
+hashed files are served with a one-year ``immutable`` cache lifetime and
+browsers fetch them once per deploy. Templates link to them with
+``asset_url('css/app.css')``.
+
+Uploaded photos under ``static/uploads`` get a shorter public lifetime;
+their names are timestamped and never rewritten.
+
+Usage: python assets.py build
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SOURCE_DIRS = ('css', 'js')
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+UPLOAD_MAX_AGE = int(os.environ.get('UPLOAD_MAX_AGE', 7 * 24 * 3600))
+
+# Precompressed variants in order of preference: (encoding, suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = {}
+
+
+def build(static_folder):
+    """Write hashed and compressed copies of the source assets; returns the manifest"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+
+    for source_dir in SOURCE_DIRS:
+        root = os.path.join(static_folder, source_dir)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    content = f.read()
+
+                stem, extension = os.path.splitext(filename)
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                hashed = f'{stem}.{digest}{extension}'
+                manifest[name] = hashed
+                # Same name means same content; only new versions are written
+                if not os.path.exists(os.path.join(dist, hashed)):
+                    _write(dist, hashed, content)
+
+    _atomic_write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def init_app(app):
+    """Build the assets, register asset_url() and the asset route, and set upload cache headers"""
+    global _manifest
+    _manifest = build(app.static_folder)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+    app.after_request(_cache_uploads)
+
+
+def asset_url(name):
+    """URL of the current hashed copy of a static/ file such as 'css/app.css'"""
+    hashed = _manifest.get(name)
+    if hashed is None:
+        return url_for('static', filename=name)
+    return url_for('asset', filename=hashed)
+
+
+def serve_asset(filename):
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+
+    # Send the smallest precompressed copy the client accepts
+    for encoding, suffix in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.exists(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, mimetype=_mimetype(filename))
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename)
+
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _cache_uploads(response):
+    filename = (request.view_args or {}).get('filename', '')
+    if request.endpoint == 'static' and filename.startswith('uploads/') and response.status_code in (200, 304):
+        response.headers['Cache-Control'] = f'public, max-age={UPLOAD_MAX_AGE}'
+    return response
+
+
+def _mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def _write(dist, hashed, content):
+    # The plain file goes last: its presence means the set is complete
+    _atomic_write(os.path.join(dist, hashed + '.gz'), gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _atomic_write(os.path.join(dist, hashed + '.br'), brotli.compress(content, quality=11))
+    _atomic_write(os.path.join(dist, hashed), content)
+
+
+def _atomic_write(path, content):
+    # Workers build at the same time on boot; never expose a half-written file
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def main(argv):
+    if argv[:1] != ['build']:
+        print(__doc__.split('Usage: ', 1)[1].rstrip())
+        return 2
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    for name, hashed in sorted(build(static_folder).items()):
+        print(f"{name} -> {DIST_DIR}/{hashed}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
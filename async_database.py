@@ -0,0 +1,310 @@
+"""Async variant of the database.py API for the ASGI app.
+
+A sync worker holds its thread for the whole of every MySQL round trip, so
+a box serves at most as many clerks at once as it has workers. Here the
+same calls are coroutines: a request waiting on the database yields the
+event loop to the others, and one process keeps many requests in flight.
+
+- ``await execute_query(query, params, fetch_one=..., fetch_all=...)`` and
+  ``await execute_many(query, params_list)`` behave like database.py's:
+  ``%s`` placeholders, rows as dicts, lastrowid and commit for writes,
+  rollback and re-raise on errors
+- ``ASYNC_DB_BACKEND=mysql`` (the default) runs them on an aiomysql pool
+  sized by the same ``DB_POOL_*`` settings and guarded by the same circuit
+  breaker as the sync pool. aiomysql is optional; install it to use this
+  backend
+- ``ASYNC_DB_BACKEND=sqlite`` runs them against ``ASYNC_SQLITE_FILE`` on a
+  small thread pool with one warm connection per thread, the way aiosqlite
+  does, for local testing without a MySQL server
+
+Pools are opened on first use inside the running event loop, so each
+worker process gets its own. ``init_database()`` applies pending
+migrations; the ASGI app runs it at startup.
+"""
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from database import BREAKER_CONFIG, DB_CONFIG, POOL_CONFIG
+import migrate
+from mysql_pool import CircuitBreaker, PoolError, PoolTimeout, PoolUnavailable
+import sqlite_db
+
+try:
+    import aiomysql
+except ImportError:  # only needed for the MySQL backend
+    aiomysql = None
+
+BACKEND = os.environ.get('ASYNC_DB_BACKEND', 'mysql')
+# Errors either backend's queries can raise, like mysql.connector's Error in database.py
+Error = (sqlite3.Error,) + ((aiomysql.Error,) if aiomysql is not None else ())
+SQLITE_FILE = os.environ.get('ASYNC_SQLITE_FILE', '/tmp/stock_monitor.db')
+
+
+class MySQLBackend:
+    """An aiomysql pool with the sync pool's wait timeout and circuit breaker"""
+
+    name = 'mysql'
+
+    def __init__(self, config, size=5, min_size=1, wait_timeout=5, max_lifetime=1800, breaker=None, **_):
+        if aiomysql is None:
+            raise RuntimeError('ASYNC_DB_BACKEND=mysql needs the aiomysql package (pip install aiomysql)')
+        self.errors = (aiomysql.Error,)
+        self.config = config
+        self.size = size
+        self.min_size = min(min_size, size)
+        self.wait_timeout = wait_timeout
+        self.max_lifetime = max_lifetime
+        self.breaker = breaker or CircuitBreaker()
+        self.waiters = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self._pool = None
+        self._loop = None
+        self._lock = None
+
+    async def _get_pool(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # An asyncio.Lock belongs to one loop, so make one per loop
+            self._lock, self._loop, self._pool = asyncio.Lock(), loop, None
+        async with self._lock:
+            # Only the first of several concurrent first requests creates the pool
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(
+                    host=self.config['host'], port=self.config['port'], user=self.config['user'],
+                    password=self.config['password'], db=self.config['database'],
+                    charset=self.config['charset'], autocommit=self.config['autocommit'],
+                    connect_timeout=self.config['connection_timeout'],
+                    minsize=self.min_size, maxsize=self.size, pool_recycle=int(self.max_lifetime))
+        return self._pool
+
+    async def acquire(self):
+        """Check out (pool, connection), waiting at most wait_timeout seconds"""
+        if not self.breaker.allow():
+            raise PoolUnavailable('MySQL circuit breaker is open')
+        conn = None
+        self.waiters += 1
+        try:
+            pool = await self._get_pool()
+            conn = await asyncio.wait_for(pool.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeout(f'No free connection within {self.wait_timeout}s')
+        except aiomysql.OperationalError as e:
+            self.breaker.record_failure()
+            raise PoolUnavailable(f'Cannot connect to MySQL: {e}') from e
+        finally:
+            self.waiters -= 1
+            # A half-open breaker lets one trial through; if it got no
+            # connection for any reason, reopen rather than stay half-open
+            if conn is None and self.breaker.state == CircuitBreaker.HALF_OPEN:
+                self.breaker.record_failure()
+        self.breaker.record_success()
+        self.checkouts += 1
+        return pool, conn
+
+    async def execute_query(self, query, params=None, fetch_one=False, fetch_all=False):
+        pool, conn = await self.acquire()
+        try:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params or ())
+                if fetch_one:
+                    return await cursor.fetchone()
+                if fetch_all:
+                    return await cursor.fetchall()
+                await conn.commit()
+                return cursor.lastrowid
+        except aiomysql.Error:
+            await conn.rollback()
+            raise
+        finally:
+            # Back to the pool it came from, even if a newer pool has been made since
+            pool.release(conn)
+
+    async def execute_many(self, query, params_list):
+        pool, conn = await self.acquire()
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(query, params_list)
+                await conn.commit()
+                return cursor.rowcount
+        except aiomysql.Error:
+            await conn.rollback()
+            raise
+        finally:
+            pool.release(conn)
+
+    def stats(self):
+        pool = self._pool
+        return {
+            'backend': self.name,
+            'size': self.size,
+            'open': pool.size if pool else 0,
+            'in_use': pool.size - pool.freesize if pool else 0,
+            'waiters': self.waiters,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'breaker': self.breaker.state,
+        }
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+
+class SQLiteBackend:
+    """sqlite3 on a thread pool, one warm connection per thread, like aiosqlite"""
+
+    name = 'sqlite'
+    errors = (sqlite3.Error,)
+
+    def __init__(self, database_file, size=5, **_):
+        self.database_file = database_file
+        self.size = size
+        self.waiters = 0
+        self.checkouts = 0
+        self._executor = None
+
+    async def _run(self, work):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='async-sqlite')
+        self.waiters += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, work)
+        finally:
+            self.waiters -= 1
+
+    def _connection(self):
+        self.checkouts += 1
+        return sqlite_db.thread_connection(self.database_file)
+
+    async def execute_query(self, query, params=None, fetch_one=False, fetch_all=False):
+        def work():
+            conn = self._connection()
+            try:
+                cursor = conn.execute(_sqlite_placeholders(query), params or ())
+                if fetch_one:
+                    row = cursor.fetchone()
+                    return dict(row) if row is not None else None
+                if fetch_all:
+                    return [dict(row) for row in cursor.fetchall()]
+                conn.commit()
+                return cursor.lastrowid
+            finally:
+                conn.close()  # rolls back anything uncommitted, keeps the connection
+        return await self._run(work)
+
+    async def execute_many(self, query, params_list):
+        def work():
+            conn = self._connection()
+            try:
+                cursor = conn.executemany(_sqlite_placeholders(query), params_list)
+                conn.commit()
+                return cursor.rowcount
+            finally:
+                conn.close()
+        return await self._run(work)
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'size': self.size,
+            'waiters': self.waiters,
+            'checkouts': self.checkouts,
+            'breaker': CircuitBreaker.CLOSED,
+        }
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def _sqlite_placeholders(query):
+    # Queries are written for MySQL; the SQLite backend takes the same text
+    return query.replace('%s', '?')
+
+
+_backend = None
+
+
+def get_backend():
+    """The configured backend, created on first use"""
+    global _backend
+    if _backend is None:
+        if BACKEND == 'sqlite':
+            _backend = SQLiteBackend(SQLITE_FILE, **POOL_CONFIG)
+        else:
+            _backend = MySQLBackend(DB_CONFIG, breaker=CircuitBreaker(**BREAKER_CONFIG), **POOL_CONFIG)
+    return _backend
+
+
+async def execute_query(query, params=None, fetch_one=False, fetch_all=False):
+    """Execute database query with proper error handling"""
+    backend = get_backend()
+    try:
+        return await backend.execute_query(query, params, fetch_one, fetch_all)
+    except backend.errors as e:
+        print(f"Database error: {e}")
+        raise
+
+
+async def execute_many(query, params_list):
+    """Execute multiple INSERT/UPDATE operations"""
+    backend = get_backend()
+    try:
+        return await backend.execute_many(query, params_list)
+    except backend.errors as e:
+        print(f"Database error in execute_many: {e}")
+        raise
+
+
+async def init_database():
+    """Apply pending schema migrations for the configured backend"""
+    if BACKEND == 'sqlite':
+        applied = await asyncio.to_thread(migrate.migrate_sqlite, SQLITE_FILE)
+    else:
+        # The sync pool is only needed for this; close it so it holds no connections
+        try:
+            conn = await asyncio.to_thread(database.get_db_connection)
+            try:
+                applied = await asyncio.to_thread(migrate.migrate_mysql, conn)
+            finally:
+                conn.close()
+        finally:
+            database.close_pool()
+    if applied:
+        print(f"Database migrations applied: {', '.join(map(str, applied))}")
+
+
+async def test_connection():
+    """Test database connection"""
+    try:
+        backend = get_backend()
+    except RuntimeError as e:
+        print(f"Connection test failed: {e}")
+        return False
+    try:
+        row = await execute_query('SELECT 1 AS ok', fetch_one=True)
+        return row['ok'] == 1
+    except (PoolError,) + backend.errors as e:
+        print(f"Connection test failed: {e}")
+        return False
+
+
+def pool_stats():
+    """Live connection pool statistics"""
+    return get_backend().stats()
+
+
+async def close_pool():
+    """Close the backend's connections; call at ASGI shutdown"""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
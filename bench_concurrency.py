@@ -0,0 +1,138 @@
+"""Load-test the sync and async serving paths side by side.
+
+Start the two servers against the same database. stable_app.py has the
+login form on both sides, so it is the app to compare, e.g.
+
+    gunicorn stable_app:app -w 4 --bind 127.0.0.1:8000
+    ASYNC_DB_BACKEND=sqlite ASGI_FALLBACK_APP=stable_app:app \
+        gunicorn asgi_app:app -w 4 -k uvicorn.workers.UvicornWorker --bind 127.0.0.1:8001
+
+then sweep concurrency levels against both:
+
+    python bench_concurrency.py --login admin:admin123 \
+        --path '/search/autocomplete?q=wid' http://127.0.0.1:8000 http://127.0.0.1:8001
+
+app.py (MySQL) has no /auth/login, so against it leave out --login and
+benchmark /health/db or another public path.
+
+Each level keeps that many clients busy for --duration seconds, one request
+after another, and reports throughput and latency percentiles. A request
+slower than --timeout counts as an error, so the level where errors start
+or p99 blows up is the server's concurrency limit. With --login each client
+signs in once through POST /auth/login and sends the session cookie;
+--data sends a form POST instead of a GET, e.g. to time the login itself.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def http_request(url, method='GET', body=b'', headers=None, timeout=10):
+    """Send one HTTP/1.1 request; returns (status, headers, body)"""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close',
+             f'Content-Length: {len(body)}']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+
+    head, _, payload = raw.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    response_headers = [tuple(h.split(': ', 1)) for h in header_lines if ': ' in h]
+    return int(status_line.split()[1]), response_headers, payload
+
+
+async def login(base_url, credentials, timeout):
+    """Sign in and return the session Cookie header value"""
+    username, _, password = credentials.partition(':')
+    body = f'username={username}&password={password}'.encode()
+    status, headers, _ = await http_request(
+        base_url + '/auth/login', 'POST', body,
+        {'Content-Type': 'application/x-www-form-urlencoded'}, timeout)
+    cookies = [value.split(';', 1)[0] for name, value in headers if name.lower() == 'set-cookie']
+    if status != 302 or not cookies:
+        raise SystemExit(f'{base_url}: login failed with HTTP {status}')
+    return '; '.join(cookies)
+
+
+async def run_level(url, concurrency, duration, timeout, cookies, data=None):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client(cookie):
+        nonlocal errors
+        headers = {'Cookie': cookie} if cookie else {}
+        if data is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status, _, _ = await http_request(url, 'POST' if data is not None else 'GET',
+                                                  data or b'', headers, timeout)
+                if status >= 400:
+                    errors += 1
+                    continue
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(cookies[i % len(cookies)] if cookies else None) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def bench(args):
+    for base_url in args.targets:
+        base_url = base_url.rstrip('/')
+        cookies = []
+        if args.login:
+            # A handful of sessions is enough; logging in every client would benchmark the hash
+            cookies = [await login(base_url, args.login, args.timeout) for _ in range(min(4, max(args.levels)))]
+
+        print(f'\n{base_url}{args.path}')
+        print(f"{'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for concurrency in args.levels:
+            latencies, errors, elapsed = await run_level(base_url + args.path, concurrency, args.duration,
+                                                         args.timeout, cookies, args.data)
+            print(f'{concurrency:>8} {len(latencies) / elapsed:>9.1f} '
+                  f'{statistics.median(latencies) * 1000 if latencies else float("nan"):>9.1f} '
+                  f'{percentile(latencies, 0.95) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f} '
+                  f'{errors:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('targets', nargs='+', help='base URLs of the servers to compare')
+    parser.add_argument('--path', default='/health/db', help='path and query to request')
+    parser.add_argument('--levels', default='1,4,16,64,256',
+                        type=lambda s: [int(n) for n in s.split(',')], help='concurrency levels to sweep')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per level')
+    parser.add_argument('--timeout', type=float, default=5, help='seconds before a request counts as an error')
+    parser.add_argument('--data', type=str.encode, help='form body to POST instead of a GET')
+    parser.add_argument('--login', metavar='USER:PASSWORD', help='sign in through /auth/login first')
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
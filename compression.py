@@ -0,0 +1,289 @@
+"""gzip/brotli compression of HTML, JSON and other text responses.
+
+The sales and wages tables repeat the same markup on every row and
+compress to a small fraction of their size, but gunicorn sends them as
+is. ``Compressor`` wraps the WSGI app and compresses a response when:
+
+- the client accepts ``br`` (if the ``brotli`` package is installed) or
+  ``gzip``
+- its Content-Type is text-like (HTML, CSS, JS, JSON, CSV, XML, SVG);
+  images and other already-compressed types are passed through
+- it is not already encoded (the precompressed assets from assets.py)
+- it is at least ``COMPRESS_MIN_SIZE`` bytes
+
+Responses without a Content-Length, such as streamed exports, are
+compressed as they stream and flushed every 16 KB of input. Data an app
+sends through the WSGI ``write()`` callable is kept in order with the rest
+of the body. Bytes before and after compression are counted per route rule
+(``/investors/ledger/<name>``, not the investor's name) and served to the
+admin at ``/health/compression``.
+"""
+import os
+import threading
+import zlib
+
+from flask import abort, jsonify, redirect, request, session, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+MAX_TRACKED_ROUTES = 200
+STREAM_FLUSH_BYTES = 16 * 1024  # flush a streamed response after this much input
+ROUTE_KEY = 'compression.route'  # environ key the app stores the matched rule under
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+
+
+class Compressor:
+    """WSGI middleware that compresses text responses the client can decode"""
+
+    def __init__(self, app, min_size=MIN_SIZE, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._routes = {}  # route rule -> [responses, bytes_in, bytes_out]
+
+    def __call__(self, environ, start_response):
+        encoding = _negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        captured = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        app_iter = _WithWrites(written, self.app(environ, capture))
+        status, headers, exc_info = captured
+        if not self._should_compress(status, headers):
+            start_response(status, headers, exc_info)
+            return app_iter
+        return self._compress(environ, encoding, app_iter, status, headers, exc_info, start_response)
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        fields = {name.lower(): value for name, value in headers}
+        content_type = fields.get('content-type', '').split(';')[0].strip().lower()
+        if 'content-encoding' in fields or 'no-transform' in fields.get('cache-control', ''):
+            return False
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        length = fields.get('content-length')
+        return length is None or (length.isdigit() and int(length) >= self.min_size)
+
+    def _compress(self, environ, encoding, app_iter, status, headers, exc_info, start_response):
+        streaming = not any(name.lower() == 'content-length' for name, _ in headers)
+        try:
+            # With no Content-Length, read far enough to know the response is worth compressing
+            buffered = []
+            size = 0
+            chunks = iter(app_iter)
+            if streaming:
+                for chunk in chunks:
+                    buffered.append(chunk)
+                    size += len(chunk)
+                    if size >= self.min_size:
+                        break
+                else:
+                    self._count_skipped()
+                    start_response(status, headers, exc_info)
+                    yield b''.join(buffered)
+                    return
+
+            start_response(status, _compressed_headers(headers, encoding), exc_info)
+            compressor = self._compressor(encoding)
+            bytes_in = bytes_out = unflushed = 0
+            for chunk in _chain(buffered, chunks):
+                bytes_in += len(chunk)
+                unflushed += len(chunk)
+                data = compressor.compress(chunk)
+                if streaming and unflushed >= STREAM_FLUSH_BYTES:
+                    # Keep a slow stream moving without flushing every tiny chunk
+                    data += compressor.flush()
+                    unflushed = 0
+                if data:
+                    bytes_out += len(data)
+                    yield data
+            data = compressor.finish()
+            bytes_out += len(data)
+            yield data
+            self._count(environ.get(ROUTE_KEY, '<unmatched>'), bytes_in, bytes_out)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def _compressor(self, encoding):
+        if encoding == 'br':
+            return _BrotliStream(self.brotli_quality)
+        return _GzipStream(self.gzip_level)
+
+    def _count(self, route, bytes_in, bytes_out):
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            entry = self._routes.get(route)
+            if entry is None:
+                if len(self._routes) >= MAX_TRACKED_ROUTES:
+                    return
+                entry = self._routes[route] = [0, 0, 0]
+            entry[0] += 1
+            entry[1] += bytes_in
+            entry[2] += bytes_out
+
+    def _count_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'compressed': self.compressed,
+                'skipped_small': self.skipped,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out,
+                'ratio': (self.bytes_out / self.bytes_in) if self.bytes_in else 0,
+                'routes': {
+                    route: {'responses': n, 'bytes_in': bytes_in, 'bytes_out': bytes_out,
+                            'bytes_saved': bytes_in - bytes_out}
+                    for route, (n, bytes_in, bytes_out) in self._routes.items()
+                },
+            }
+
+
+class _WithWrites:
+    """An app_iter with the data the app passed to write() put back in order"""
+
+    def __init__(self, written, app_iter):
+        self._written = written
+        self._app_iter = app_iter
+
+    def __iter__(self):
+        for chunk in self._app_iter:
+            yield from self._drain()
+            yield chunk
+        yield from self._drain()
+
+    def _drain(self):
+        chunks, self._written[:] = self._written[:], []
+        return chunks
+
+    def close(self):
+        if hasattr(self._app_iter, 'close'):
+            self._app_iter.close()
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._b = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._b.process(data)
+
+    def flush(self):
+        return self._b.flush()
+
+    def finish(self):
+        return self._b.finish()
+
+
+def init_app(app):
+    """Compress app's responses and serve the byte counts to the admin at /health/compression"""
+    compressor = Compressor(app.wsgi_app)
+    app.wsgi_app = compressor
+
+    @app.after_request
+    def remember_route(response):
+        # The rule, not the path, so stats neither hold names from URLs nor
+        # fill up with one entry per id
+        if request.url_rule is not None:
+            request.environ[ROUTE_KEY] = request.url_rule.rule
+        return response
+
+    def health_compression():
+        if 'user_id' not in session:
+            return redirect(url_for('login'))
+        if session.get('username') != 'admin':
+            abort(403)
+        return jsonify(compressor.stats())
+
+    app.add_url_rule('/health/compression', 'health_compression', health_compression)
+    return compressor
+
+
+def _negotiate(accept_encoding):
+    # Prefer brotli; honour q=0 refusals
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+def _compressed_headers(headers, encoding):
+    result = []
+    vary = None
+    for name, value in headers:
+        lower = name.lower()
+        if lower == 'content-length':
+            continue
+        if lower == 'etag' and not value.startswith('W/'):
+            # A different byte representation; only weak comparison may match it
+            value = 'W/' + value
+        if lower == 'vary':
+            vary = value
+            continue
+        result.append((name, value))
+    result.append(('Content-Encoding', encoding))
+    if not vary:
+        vary = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        vary += ', Accept-Encoding'
+    result.append(('Vary', vary))
+    return result
+
+
+def _chain(buffered, rest):
+    yield from buffered
+    yield from rest
@@ -0,0 +1,152 @@
+"""Streaming CSV exports of sales, wages and investment transactions.
+
+``/export/sales.csv``, ``/export/wages.csv`` and ``/export/investments.csv``
+write rows to the response as they are read: the query is walked with
+``fetchmany`` (on MySQL through an unbuffered cursor, so rows stay on the
+server until fetched) and each batch is encoded and sent before the next
+is read. Memory per export stays at one batch however many rows match.
+
+Rows come out oldest first along the date index each table already has,
+so neither database needs to sort the result. Query arguments:
+
+- ``start`` / ``end`` - inclusive ``YYYY-MM-DD`` range
+- ``item`` - sales of one item (id or exact name)
+- ``employee`` - wages of one employee
+- ``investor`` - transactions of one investor
+
+Item, employee and investor names are typed in by users, so a text cell
+starting with ``=``, ``+``, ``-``, ``@``, a tab or a carriage return is
+prefixed with ``'`` to stop spreadsheets running it as a formula.
+"""
+import csv
+import io
+import os
+
+from flask import Response, abort, redirect, request, session, stream_with_context, url_for
+
+import pagination
+import sqlite_db
+
+BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+
+# Leading characters that make Excel, LibreOffice and Sheets read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# name -> (table, date column, exported columns, {query argument: filter column}, admin only)
+EXPORTS = {
+    'sales': ('sales', 'sold_at',
+              ('id', 'sold_at', 'item_id', 'item_name', 'quantity_sold', 'selling_price',
+               'total_amount', 'user_name', 'place'),
+              {'item': 'item_id'}, False),
+    'wages': ('wages', 'created_at',
+              ('id', 'created_at', 'employee_name', 'amount', 'wage_type', 'description'),
+              {'employee': 'employee_name'}, False),
+    'investments': ('investment_transactions', 'created_at',
+                    ('id', 'created_at', 'transaction_type', 'amount', 'investor_name',
+                     'investor_email', 'description'),
+                    {'investor': 'investor_name'}, True),
+}
+
+
+def init_app(app, dialect='sqlite'):
+    """Register the /export/<name>.csv endpoints for a 'sqlite' or 'mysql' app"""
+    open_cursor = _mysql_cursor if dialect == 'mysql' else _sqlite_cursor
+    placeholder = '%s' if dialect == 'mysql' else '?'
+
+    def export_csv(name):
+        if 'user_id' not in session:
+            return redirect(url_for('login'))
+        if name not in EXPORTS:
+            abort(404)
+        if EXPORTS[name][4] and session.get('username') != 'admin':
+            abort(403)
+        columns, sql, params = build_query(name, request.args, placeholder)
+        return csv_response(f'{name}.csv', columns, open_cursor, sql, params)
+
+    app.add_url_rule('/export/<name>.csv', 'export_csv', export_csv)
+    app.jinja_env.globals['export_url'] = export_url
+
+
+def export_url(name, **filters):
+    """URL of an export with the page's current filters (None values are left out)"""
+    return url_for('export_csv', name=name, **{k: v for k, v in filters.items() if v})
+
+
+def build_query(name, args, placeholder='?'):
+    """Return (columns, sql, params) for export name filtered by the request args"""
+    table, date_column, columns, filters, _ = EXPORTS[name]
+    conditions, params = pagination.date_range_clause(
+        date_column, pagination.parse_date(args.get('start')), pagination.parse_date(args.get('end')),
+        placeholder)
+
+    for argument, column in filters.items():
+        value = args.get(argument)
+        if not value:
+            continue
+        if argument == 'item' and not value.isdigit():
+            column = 'item_name'
+        conditions.append(f'{column} = {placeholder}')
+        params.append(value)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    sql = f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY {date_column}, id"
+    return columns, sql, params
+
+
+def csv_response(filename, columns, open_cursor, sql, params):
+    """Stream the rows of sql as a CSV download"""
+    # The request context (and its database connection) lives until the stream ends
+    return Response(stream_with_context(stream_csv(columns, open_cursor, sql, params)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}',
+                             'Cache-Control': 'private, no-store'})
+
+
+def stream_csv(columns, open_cursor, sql, params):
+    """Yield CSV text for the rows of sql, one fetchmany() batch at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    cursor, release = open_cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            writer.writerows(tuple(_cell(value) for value in row) for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # header of an empty export
+    finally:
+        release(cursor)
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _sqlite_cursor():
+    cursor = sqlite_db.get_db().cursor()
+    return cursor, lambda cursor: cursor.close()
+
+
+def _mysql_cursor():
+    from database import get_db_connection
+    conn = get_db_connection()
+    cursor = conn.cursor(buffered=False)
+
+    def release(cursor):
+        # An export stopped part way leaves unread rows; the pool discards
+        # that connection rather than reusing it
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    return cursor, release
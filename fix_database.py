@@ -47,7 +47,11 @@ if DATABASE_URL:
     
 else:
     # Use SQLite for local development
+    import sqlite_db
+    import migrate
+    
     DATABASE_PATH = 'database.db'
+    sqlite_db.init_app(app, DATABASE_PATH)
     
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     
@@ -55,9 +59,8 @@ else:
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
     
     def get_db():
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row
-        return conn
+        # One warm connection per thread, shared by every query in a request
+        return sqlite_db.get_db()
     
     def query_db(query, args=(), one=False):
         conn = get_db()
@@ -129,55 +132,8 @@ def init_db():
             hashed_password = generate_password_hash('admin123')
             execute_db('INSERT INTO users (username, password_hash) VALUES (%s, %s)', ('admin', hashed_password))
     else:
-        # SQLite setup
-        execute_db('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE,
-                email TEXT,
-                password_hash TEXT,
-                profile_image TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        execute_db('''
-            CREATE TABLE IF NOT EXISTS stock_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                selling_price REAL NOT NULL,
-                description TEXT,
-                image_path TEXT,
-                total_initial_value REAL,
-                current_stock_value REAL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        execute_db('''
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_id INTEGER,
-                item_name TEXT,
-                quantity_sold INTEGER,
-                selling_price REAL,
-                total_amount REAL,
-                image_path TEXT,
-                sale_image_path TEXT,
-                user_id INTEGER,
-                user_name TEXT,
-                user_email TEXT,
-                place TEXT,
-                sold_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Check if admin user exists
-        admin = query_db('SELECT * FROM users WHERE username = ?', ('admin',), one=True)
-        if not admin:
-            hashed_password = generate_password_hash('admin123')
-            execute_db('INSERT INTO users (username, password_hash) VALUES (?, ?)', ('admin', hashed_password))
+        # SQLite schema is versioned; warm starts only check the version
+        migrate.migrate_sqlite(DATABASE_PATH)
 
 # Initialize database
 init_db()
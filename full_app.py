@@ -1,11 +1,29 @@
+import io
 import os
 import sqlite3
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, abort
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import secrets
-import base64
+import api
+import inventory
+import item_import
+import pagination
+import ledger
+import sqlite_db
+import query_cache
+import sales_rollup
+import stock_alerts
+import http_cache
+import assets
+import compression
+import exports
+import images
+import item_search
+import migrate
+import uploads
+import write_queue
 
 app = Flask(__name__)
 
@@ -20,100 +38,29 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # Database with persistent storage
+DATABASE_FILE = '/tmp/stock_monitor.db'
+
+def init_database():
+    """Apply pending schema migrations (a single version check on warm starts)"""
+    migrate.migrate_sqlite(DATABASE_FILE)
+
 def get_db():
-    try:
-        # Try to use persistent storage
-        conn = sqlite3.connect('/tmp/stock_monitor.db')
-        conn.row_factory = sqlite3.Row
-    except:
-        # Fallback to in-memory
-        conn = sqlite3.connect(':memory:')
-        conn.row_factory = sqlite3.Row
-    
-    # Create tables if they don't exist
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password_hash TEXT,
-            email TEXT,
-            profile_image TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Stock items table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS stock_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            quantity INTEGER NOT NULL,
-            selling_price REAL NOT NULL,
-            description TEXT,
-            image_path TEXT,
-            total_initial_value REAL,
-            current_stock_value REAL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Sales table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sales (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            item_id INTEGER,
-            item_name TEXT,
-            quantity_sold INTEGER,
-            selling_price REAL,
-            total_amount REAL,
-            image_path TEXT,
-            sale_image_path TEXT,
-            user_id INTEGER,
-            user_name TEXT,
-            user_email TEXT,
-            place TEXT,
-            sold_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Investment transactions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS investment_transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            transaction_type TEXT,
-            amount REAL,
-            description TEXT,
-            investor_name TEXT,
-            investor_email TEXT,
-            investor_phone TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Wages table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS wages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_name TEXT,
-            amount REAL,
-            wage_type TEXT,
-            description TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create admin user if not exists
-    cursor.execute('SELECT * FROM users WHERE username = ?', ('admin',))
-    if not cursor.fetchone():
-        hashed_password = generate_password_hash('admin123')
-        cursor.execute('INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)', 
-                      ('admin', hashed_password, 'admin@stockmonitor.com'))
-    
-    conn.commit()
-    return conn
+    """Get this request's database connection (a warm per-thread connection)"""
+    return sqlite_db.get_db()
+
+# Background writes (thumbnail paths) go through one writer thread that commits them in groups
+writer = write_queue.create_writer(DATABASE_FILE)
+
+sqlite_db.init_app(app, DATABASE_FILE)
+http_cache.init_app(app)
+assets.init_app(app)
+compression.init_app(app)
+exports.init_app(app)
+uploads.init_app(app)
+stock_alerts.init_app(app)
+item_search.init_app(app)
+api.init_app(app)
+init_database()
 
 @app.route('/')
 def index():
@@ -189,26 +136,11 @@ def auth_register():
     
     # Handle profile image
     profile_image = None
-    image_data = request.form.get('imageData')
+    image_handle = request.form.get('imageHandle')
     
-    if image_data and image_data.startswith('data:image'):
-        # Handle base64 image data from camera
-        image_data = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        
-        # Generate filename and save
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"profile_{timestamp}_camera.jpg"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        # Ensure upload directory exists
-        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        
-        with open(file_path, 'wb') as f:
-            f.write(image_bytes)
-        
-        profile_image = file_path
+    if image_handle:
+        # Camera capture already streamed to /upload/camera
+        profile_image = uploads.claim(image_handle, 'profile', app.config['UPLOAD_FOLDER'])
     elif 'profile_image' in request.files:
         # Handle traditional file upload
         file = request.files['profile_image']
@@ -256,40 +188,27 @@ def dashboard():
     conn = get_db()
     cursor = conn.cursor()
     
-    # Get total items
-    cursor.execute('SELECT COUNT(*) as count FROM stock_items')
-    total_items = cursor.fetchone()['count']
-    
-    # Get current stock value
-    cursor.execute('SELECT SUM(current_stock_value) as total FROM stock_items')
-    current_stock_value = cursor.fetchone()['total'] or 0
-    
-    # Get expected revenue
-    cursor.execute('SELECT SUM(selling_price * quantity) as total FROM stock_items')
-    expected_revenue = cursor.fetchone()['total'] or 0
-    
-    # Get recent items
-    cursor.execute('SELECT * FROM stock_items ORDER BY created_at DESC LIMIT 5')
-    recent_items = cursor.fetchall()
+    # Totals and recent items come from the maintained summary row
+    summary = inventory.get_summary(cursor)
     
     conn.close()
     
     return render_template('dashboard.html', 
                          username=session.get('username', 'User'),
-                         total_items=total_items,
-                         current_stock_value=current_stock_value,
-                         expected_revenue=expected_revenue,
-                         recent_items=recent_items)
+                         total_items=summary['total_items'],
+                         current_stock_value=summary['current_stock_value'],
+                         expected_revenue=summary['expected_revenue'],
+                         recent_items=summary['recent_items'])
 
 @app.route('/items')
+@http_cache.conditional('stock_items')
 def items():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM stock_items ORDER BY created_at DESC')
-    items_list = cursor.fetchall()
+    items_list = query_cache.cached_query(cursor, ('stock_items',), 'SELECT * FROM stock_items ORDER BY created_at DESC')
     conn.close()
     
     return render_template('items.html', items=items_list)
@@ -304,6 +223,7 @@ def add_item():
         quantity = int(request.form['quantity'])
         selling_price = float(request.form['selling_price'])
         description = request.form['description']
+        reorder_level = max(0, request.form.get('reorder_level', 0, type=int))
         
         # Handle image upload
         image_path = None
@@ -321,45 +241,94 @@ def add_item():
                 file.save(file_path)
                 image_path = file_path
         
-        # Calculate values
-        total_initial_value = quantity * selling_price
-        current_stock_value = quantity * selling_price
-        
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO stock_items (name, quantity, selling_price, description, image_path, 
-                                   total_initial_value, current_stock_value)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (name, quantity, selling_price, description, image_path, 
-              total_initial_value, current_stock_value))
+        item_id = inventory.add_stock_item(cursor, name, quantity, selling_price, description, image_path,
+                                           reorder_level)
         conn.commit()
         conn.close()
         
+        # Thumbnails are made off the request thread
+        images.schedule(writer.run, item_id, image_path)
+        
         flash('Item added successfully!', 'success')
         return redirect(url_for('items'))
     
     return render_template('add_item.html')
 
+@app.route('/items/import', methods=['GET', 'POST'])
+def import_items():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if session.get('username') != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('csv_file')
+        if not upload or not upload.filename:
+            flash('Please choose a CSV file', 'error')
+            return redirect(url_for('import_items'))
+        
+        dry_run = bool(request.form.get('dry_run'))
+
+        def write_batch(rows):
+            # One transaction per batch
+            conn = get_db()
+            try:
+                item_import.insert_batch(conn.cursor(), rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        # Werkzeug has spooled the upload to disk; read it a line at a time
+        lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            report = item_import.run_import(lines, write_batch, dry_run=dry_run)
+        except ValueError as e:
+            flash(f'Cannot import this file: {str(e)}', 'error')
+            return redirect(url_for('import_items'))
+        except item_import.ImportFailed as e:
+            flash(f'Import stopped: {str(e)}', 'error')
+            report = e.report
+        report['dry_run'] = dry_run
+    
+    return render_template('import_items.html', report=report)
+
 @app.route('/sales')
+@http_cache.conditional('sales', 'stock_items')
 def sales():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
     conn = get_db()
     cursor = conn.cursor()
-    
-    # Get all sales
-    cursor.execute('SELECT * FROM sales ORDER BY sold_at DESC')
-    sales_list = cursor.fetchall()
+    args = pagination.page_args(request.args)
+    
+    # Get one page of sales, newest first
+    page = pagination.fetch_page(cursor, 'sales', 'sold_at', **args)
+    
+    # Get totals: the rollup covers all history, a date filter needs the sales themselves
+    if args['start_date'] or args['end_date']:
+        where, params = pagination.date_filter('sold_at', args['start_date'], args['end_date'])
+        cursor.execute(f'''
+            SELECT COUNT(*) as count, COALESCE(SUM(total_amount), 0) as revenue,
+                   COALESCE(SUM(quantity_sold), 0) as units
+            FROM sales {where}
+        ''', params)
+        sales_totals = cursor.fetchone()
+    else:
+        sales_totals = sales_rollup.sales_totals(cursor)
     
     # Get available items for sale
-    cursor.execute('SELECT * FROM stock_items WHERE quantity > 0 ORDER BY name')
-    available_items = cursor.fetchall()
+    available_items = query_cache.cached_query(cursor, ('stock_items',), 'SELECT * FROM stock_items WHERE quantity > 0 ORDER BY name')
     
     conn.close()
     
-    return render_template('sales.html', sales=sales_list, available_items=available_items)
+    return render_template('sales.html', sales=page['rows'], page=page, sales_totals=sales_totals,
+                         start_date=args['start_date'], end_date=args['end_date'],
+                         available_items=available_items, report_url=url_for('revenue_report'))
 
 @app.route('/sell_item/<int:id>', methods=['GET', 'POST'])
 def sell_item(id):
@@ -369,67 +338,170 @@ def sell_item(id):
     conn = get_db()
     cursor = conn.cursor()
     
-    # Get item details
-    cursor.execute('SELECT * FROM stock_items WHERE id = ?', (id,))
-    item = cursor.fetchone()
-    
-    if not item:
-        flash('Item not found', 'error')
-        conn.close()
-        return redirect(url_for('sales'))
-    
     if request.method == 'POST':
         quantity_sold = int(request.form['quantity_sold'])
         place = request.form.get('place', '')
         
-        if quantity_sold > item['quantity']:
-            flash('Not enough stock available', 'error')
+        if quantity_sold <= 0:
+            flash('Quantity must be at least 1', 'error')
             conn.close()
             return redirect(url_for('sell_item', id=id))
         
-        # Update item quantity
-        new_quantity = item['quantity'] - quantity_sold
-        cursor.execute('UPDATE stock_items SET quantity = ?, current_stock_value = ? WHERE id = ?', 
-                      (new_quantity, new_quantity * item['selling_price'], id))
+        # Check and decrement stock in one statement, then record the sale
+        sale = inventory.sell_stock(cursor, id, quantity_sold, session['user_id'],
+                                    session['username'], session.get('user_email', ''), place)
         
-        # Add to sales
-        total_amount = quantity_sold * item['selling_price']
-        cursor.execute('''
-            INSERT INTO sales (item_id, item_name, quantity_sold, selling_price, total_amount, 
-                             image_path, user_id, user_name, user_email, place)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (id, item['name'], quantity_sold, item['selling_price'], total_amount, 
-              item['image_path'], session['user_id'], session['username'], 
-              session.get('user_email', ''), place))
+        if sale is None:
+            conn.rollback()
+            cursor.execute('SELECT id FROM stock_items WHERE id = ?', (id,))
+            if not cursor.fetchone():
+                flash('Item not found', 'error')
+                conn.close()
+                return redirect(url_for('sales'))
+            flash('Not enough stock available', 'error')
+            conn.close()
+            return redirect(url_for('sell_item', id=id))
         
         conn.commit()
         conn.close()
         
-        flash(f'Sold {quantity_sold} {item["name"]} successfully!', 'success')
+        flash(f'Sold {quantity_sold} {sale["item_name"]} successfully!', 'success')
         return redirect(url_for('sales'))
     
+    # Get item details
+    cursor.execute('SELECT * FROM stock_items WHERE id = ?', (id,))
+    item = cursor.fetchone()
     conn.close()
+    
+    if not item:
+        flash('Item not found', 'error')
+        return redirect(url_for('sales'))
+    
     return render_template('sell_item.html', item=item)
 
-@app.route('/wages')
-def wages():
+@app.route('/reports/revenue')
+@http_cache.conditional('sales')
+def revenue_report():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    period = request.args.get('period', 'day')
+    if period not in sales_rollup.PERIODS:
+        period = 'day'
+    start_date = pagination.parse_date(request.args.get('start'))
+    end_date = pagination.parse_date(request.args.get('end'))
+    item_id = request.args.get('item', type=int)
+    seller_id = request.args.get('seller', type=int)
+    if not start_date:
+        # Put the default range in the URL so the page's ETag covers it
+        return redirect(url_for('revenue_report', period=period, start=sales_rollup.default_start(period),
+                                end=end_date, item=item_id, seller=seller_id))
+    
+    # Read from the daily rollup; the sales table itself is never scanned
+    report = sales_rollup.revenue_report(get_db().cursor(), period, start_date, end_date, item_id, seller_id)
+    return render_template('revenue_report.html', report=report, period=period, start_date=start_date,
+                           end_date=end_date, item_id=item_id, seller_id=seller_id)
+
+@app.route('/reports/velocity')
+@http_cache.conditional('sales', 'stock_items')
+def velocity_report():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    days = request.args.get('days', 30, type=int)
+    limit = request.args.get('limit', 10, type=int)
+    end_date = pagination.parse_date(request.args.get('end'))
+    if not end_date:
+        # The window trails today; name the day in the URL so the ETag changes with it
+        return redirect(url_for('velocity_report', days=days, limit=limit,
+                                end=datetime.utcnow().strftime('%Y-%m-%d')))
+    
+    # Ranked from the daily rollup and the per-item counters, never the sales table
+    report = sales_rollup.velocity_report(get_db().cursor(), end_date, days, limit)
+    return render_template('velocity_report.html', report=report, limit=limit)
+
+@app.route('/checkout', methods=['GET', 'POST'])
+def checkout():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
     conn = get_db()
     cursor = conn.cursor()
     
-    # Get total wages paid
-    cursor.execute('SELECT SUM(amount) as total FROM wages')
-    total_wages = cursor.fetchone()['total'] or 0
+    if request.method == 'POST':
+        payload = request.get_json(silent=True)
+        try:
+            # JSON clients send {"lines": [{"item_id": 1, "quantity": 2}], "place": "..."}
+            if payload is not None:
+                lines = [(int(line['item_id']), int(line['quantity'])) for line in payload.get('lines', [])]
+                place = payload.get('place', '')
+            else:
+                lines = [(int(item_id), int(quantity))
+                         for item_id, quantity in zip(request.form.getlist('item_id'), request.form.getlist('quantity'))
+                         if quantity and int(quantity) != 0]
+                place = request.form.get('place', '')
+            
+            result = inventory.checkout(cursor, lines, session['user_id'], session['username'],
+                                        session.get('user_email', ''), place)
+            conn.commit()
+            conn.close()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            conn.close()
+            errors = ['Each basket line needs a numeric item_id and quantity']
+            if payload is not None:
+                return jsonify({'ok': False, 'errors': errors}), 400
+            flash(errors[0], 'error')
+            return redirect(url_for('checkout'))
+        except inventory.CheckoutError as e:
+            conn.rollback()
+            conn.close()
+            if payload is not None:
+                return jsonify({'ok': False, 'errors': e.errors}), 409
+            for error in e.errors:
+                flash(error, 'error')
+            return redirect(url_for('checkout'))
+        
+        if payload is not None:
+            return jsonify({'ok': True, **result})
+        flash(f"Sold {result['total_quantity']} items across {result['lines']} lines for ${result['total_amount']:.2f}!", 'success')
+        return redirect(url_for('sales'))
+    
+    # Get available items for the basket form
+    available_items = query_cache.cached_query(cursor, ('stock_items',), 'SELECT id, name, quantity, selling_price FROM stock_items WHERE quantity > 0 ORDER BY name')
+    conn.close()
+    
+    return render_template('checkout.html', available_items=available_items)
+
+@app.route('/wages')
+@http_cache.conditional('wages')
+def wages():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
     
-    # Get all wages
-    cursor.execute('SELECT * FROM wages ORDER BY created_at DESC')
-    wages_list = cursor.fetchall()
+    conn = get_db()
+    cursor = conn.cursor()
+    args = pagination.page_args(request.args)
+    
+    # Get wage totals for the filtered history
+    where, params = pagination.date_filter('created_at', args['start_date'], args['end_date'])
+    cursor.execute(f'''
+        SELECT COUNT(*) as count, COALESCE(SUM(amount), 0) as total,
+               SUM(CASE WHEN wage_type = 'salary' THEN 1 ELSE 0 END) as salary_count,
+               COALESCE(SUM(CASE WHEN wage_type = 'salary' THEN amount END), 0) as salary_total,
+               COALESCE(SUM(CASE WHEN wage_type = 'hourly' THEN amount END), 0) as hourly_total,
+               COALESCE(SUM(CASE WHEN wage_type = 'bonus' THEN amount END), 0) as bonus_total
+        FROM wages {where}
+    ''', params)
+    wage_totals = cursor.fetchone()
+    
+    # Get one page of wages, newest first
+    page = pagination.fetch_page(cursor, 'wages', 'created_at', **args)
     
     conn.close()
     
-    return render_template('wages.html', wages=wages_list, total_wages=total_wages)
+    return render_template('wages.html', wages=page['rows'], page=page, wage_totals=wage_totals,
+                         total_wages=wage_totals['total'],
+                         start_date=args['start_date'], end_date=args['end_date'])
 
 @app.route('/add_wage', methods=['GET', 'POST'])
 def add_wage():
@@ -446,6 +518,7 @@ def add_wage():
         cursor = conn.cursor()
         cursor.execute('INSERT INTO wages (employee_name, amount, wage_type, description) VALUES (?, ?, ?, ?)', 
                       (employee_name, amount, wage_type, description))
+        query_cache.bump(cursor, 'wages')
         conn.commit()
         conn.close()
         
@@ -466,28 +539,28 @@ def investment():
     conn = get_db()
     cursor = conn.cursor()
     
-    # Get total investment
-    cursor.execute('SELECT SUM(CASE WHEN transaction_type = "invest" THEN amount ELSE -amount END) as total FROM investment_transactions')
-    total_invested = cursor.fetchone()['total'] or 0
+    # Get total investment from the per-investor balances
+    total_invested = ledger.get_net_investment(cursor)
     
     # Get stock value
-    cursor.execute('SELECT SUM(current_stock_value) as total FROM stock_items')
-    stock_value = cursor.fetchone()['total'] or 0
+    stock_value = inventory.get_stock_value(cursor)
     
-    # Get all transactions
-    cursor.execute('SELECT * FROM investment_transactions ORDER BY created_at DESC')
-    transactions = cursor.fetchall()
+    # Get one page of transactions, newest first
+    args = pagination.page_args(request.args)
+    page = pagination.fetch_page(cursor, 'investment_transactions', 'created_at', **args)
     
     # Get items list
-    cursor.execute('SELECT * FROM stock_items ORDER BY name')
-    items_list = cursor.fetchall()
+    items_list = query_cache.cached_query(cursor, ('stock_items',), 'SELECT * FROM stock_items ORDER BY name')
     
     conn.close()
     
     return render_template('investment.html', 
                          total_invested=total_invested,
                          stock_value=stock_value,
-                         transactions=transactions,
+                         transactions=page['rows'],
+                         page=page,
+                         start_date=args['start_date'],
+                         end_date=args['end_date'],
                          items=items_list)
 
 @app.route('/investment/add', methods=['GET', 'POST'])
@@ -514,6 +587,8 @@ def add_investment():
                                              investor_name, investor_email, investor_phone)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (transaction_type, amount, description, investor_name, investor_email, investor_phone))
+        ledger.record_transaction(cursor, investor_name, investor_email, investor_phone,
+                                  transaction_type, amount)
         conn.commit()
         conn.close()
         
@@ -523,6 +598,7 @@ def add_investment():
     return render_template('add_investment.html')
 
 @app.route('/investors')
+@http_cache.conditional('investor_balances')
 def investors():
     if 'user_id' not in session:
         return redirect(url_for('login'))
@@ -534,32 +610,10 @@ def investors():
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT investor_name, investor_email, investor_phone, transaction_type, amount FROM investment_transactions')
-    transactions = cursor.fetchall()
+    # One read of the maintained per-investor totals
+    investors_list = ledger.get_balances(cursor)
     conn.close()
     
-    investor_data = {}
-    for t in transactions:
-        name, email, phone, type, amount = t
-        if name not in investor_data:
-            investor_data[name] = {
-                'name': name,
-                'email': email,
-                'phone': phone,
-                'total_invested': 0.0,
-                'total_withdrawn': 0.0,
-                'balance': 0.0
-            }
-        
-        if type == 'invest':
-            investor_data[name]['total_invested'] += amount
-        else:
-            investor_data[name]['total_withdrawn'] += amount
-        
-        investor_data[name]['balance'] = investor_data[name]['total_invested'] - investor_data[name]['total_withdrawn']
-            
-    investors_list = list(investor_data.values())
-    
     return render_template('investors.html', investors=investors_list)
 
 @app.route('/investors/ledger/<name>')
@@ -577,19 +631,30 @@ def investor_ledger(name):
     cursor.execute('SELECT * FROM investment_transactions WHERE investor_name = ? ORDER BY created_at DESC', (name,))
     transactions = cursor.fetchall()
     
-    # Calculate totals
-    total_invested = sum(t['amount'] for t in transactions if t['transaction_type'] == 'invest')
-    total_withdrawn = sum(t['amount'] for t in transactions if t['transaction_type'] == 'withdraw')
-    balance = total_invested - total_withdrawn
+    # Get totals from the maintained balance row
+    totals = ledger.get_balance(cursor, name)
     
     conn.close()
     
     return render_template('investor_ledger.html', 
                          investor_name=name, 
                          transactions=transactions,
-                         total_invested=total_invested,
-                         total_withdrawn=total_withdrawn,
-                         balance=balance)
+                         total_invested=totals['total_invested'],
+                         total_withdrawn=totals['total_withdrawn'],
+                         balance=totals['balance'])
+
+@app.route('/health/cache')
+def health_cache():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    # Cache keys and table versions are for the admin only, like /health/compression
+    if session.get('username') != 'admin':
+        abort(403)
+    
+    # Read cache hit/miss counters for this worker
+    stats = query_cache.stats()
+    return jsonify(stats)
 
 if __name__ == '__main__':
     # Ensure upload directory exists
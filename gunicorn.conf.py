@@ -0,0 +1,29 @@
+"""gunicorn settings for app:app.
+
+The app is imported once in the master (preload) and the workers are
+forked from it, so config, routes, assets and compiled templates are built
+once and shared copy-on-write instead of rebuilt in every worker. Anything
+that holds a socket is per worker: database.py makes its pool on a
+worker's first query, and post_fork drops any pool inherited anyway.
+"""
+import gc
+import os
+
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+
+def when_ready(server):
+    # The preloaded objects live as long as the master; keeping them out of
+    # the collector stops worker GC passes from copying their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import database
+    database.after_fork()
+
+
+def worker_exit(server, worker):
+    import database
+    database.close_pool()
@@ -0,0 +1,127 @@
+"""Conditional GETs and rendered-fragment caching for the SQLite list pages.
+
+Most hits on the items, sales, wages and investors pages are refreshes of
+a page that has not changed. ``conditional(*tables)`` derives an ETag and
+Last-Modified from the ``table_versions`` rows of the tables a page reads
+(plus the URL, the signed-in user and the template version) and answers
+a matching ``If-None-Match``/``If-Modified-Since`` with a 304 before the
+view runs a single query or renders anything. ``daily=True`` is for
+pages that also show figures for the current UTC day: their ETag includes
+the date and they count as modified at midnight.
+
+When the page does have to be rendered, templates wrap their table bodies
+in ``fragment()``, which reuses the rendered rows from the query cache
+while those tables are unchanged.
+
+Pages that show flash messages are never tagged, so a refresh cannot
+replay a stale message from the browser cache.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import g, request, session, make_response, render_template, get_flashed_messages
+from markupsafe import Markup
+
+import query_cache
+import sqlite_db
+
+_template_version = ''
+_page_tables = ()  # tables behind content on every page, such as a navigation badge
+
+
+def init_app(app):
+    """Register fragment() for templates and fingerprint the templates for ETags"""
+    global _template_version
+    _template_version = _fingerprint(os.path.join(app.root_path, app.template_folder))
+    app.jinja_env.globals['fragment'] = fragment
+
+
+def add_page_tables(*tables):
+    """Fold tables into every conditional page's ETag, for content shown on every page"""
+    global _page_tables
+    _page_tables = tuple(dict.fromkeys(_page_tables + tables))
+
+
+def conditional(*tables, daily=False):
+    """Serve 304 Not Modified for a GET page built only from tables, when unchanged"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'GET' or 'user_id' not in session or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            versions, updated_at = query_cache.cache.state(sqlite_db.get_db(), tables + _page_tables)
+            last_modified = _parse_timestamp(updated_at)
+            if daily:
+                # Today's figures start over at midnight even if no table changed since
+                midnight = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+                versions = versions + (midnight.date().isoformat(),)
+                last_modified = max(last_modified or midnight, midnight)
+            etag = _etag(versions)
+            g.page_versions = (tables, versions)
+
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or get_flashed_messages():
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let the browser keep the page but make it ask us before reusing it
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapped
+    return decorator
+
+
+def fragment(template_name, **context):
+    """Render template_name with context, reusing the last render while the page's tables are unchanged"""
+    page = g.get('page_versions')
+    if page is None:
+        return Markup(render_template(template_name, **context))
+
+    tables, _ = page
+    key = ('fragment', template_name, request.full_path, session.get('user_id'))
+    return query_cache.cache.memoize(sqlite_db.get_db(), tables, key,
+                                     lambda: Markup(render_template(template_name, **context)))
+
+
+def _etag(versions):
+    parts = [_template_version, request.full_path, str(session.get('user_id')),
+             str(session.get('username')), ','.join(map(str, versions))]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match wins when present; Last-Modified only has one-second resolution.
+    # Weak comparison, since compression.py marks the ETag of compressed pages weak
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _parse_timestamp(value):
+    # SQLite CURRENT_TIMESTAMP is UTC 'YYYY-MM-DD HH:MM:SS'
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _fingerprint(template_folder):
+    # Templates change on deploy; fold them into the ETag so old pages are not reused
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(template_folder)):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f'{name}:{stat.st_size}:{int(stat.st_mtime)}'.encode('utf-8'))
+    return digest.hexdigest()[:12]
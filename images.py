@@ -0,0 +1,106 @@
+"""Thumbnail and preview generation for uploaded item photos.
+
+Uploads are phone-camera photos of several megabytes, and the items and
+sales pages used to embed the original for every row. After an upload is
+saved, ``schedule()`` hands it to a small background thread pool that
+decodes it once and writes a small thumbnail and a medium preview next
+to it. It then records their paths on the stock item (and on any sales
+of it) through the app's group-commit writer, so the pages can serve the
+thumbnail instead of the original. Sales carry no photo of their own, so
+item photos are the only ones thumbnailed.
+
+Pillow is optional: without it nothing is scheduled and the templates
+keep falling back to the original image.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+import query_cache
+
+# Largest size of each variant, in pixels; variants are written largest first
+VARIANTS = (
+    ('preview', (800, 800)),
+    ('thumb', (160, 160)),
+)
+JPEG_QUALITY = 82
+WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def variant_path(image_path, variant):
+    """Where the variant of image_path is stored, e.g. static/uploads/thumb/item_1.jpg"""
+    directory, filename = os.path.split(image_path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, variant, f'{stem}.jpg')
+
+
+def generate_variants(image_path):
+    """Decode image_path once and write every variant; returns {variant: path}"""
+    paths = {}
+    with Image.open(image_path) as original:
+        # Let the JPEG decoder downscale while decoding instead of afterwards
+        original.draft('RGB', VARIANTS[0][1])
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    for variant, size in VARIANTS:
+        image.thumbnail(size, Image.LANCZOS)
+        path = variant_path(image_path, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.save(path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        paths[variant] = path
+    return paths
+
+
+def schedule(run, item_id, image_path):
+    """Generate variants for a stock item's image in the background
+
+    run(op, *args) performs the write that records them, e.g. a
+    write_queue writer's run.
+    """
+    if Image is None or not image_path:
+        return None
+    return _get_executor().submit(_process, run, item_id, image_path)
+
+
+def record_variants(cursor, item_id, thumb_path, preview_path):
+    """Point the stock item and its sales so far at the new variants"""
+    cursor.execute('UPDATE stock_items SET thumb_path = ?, preview_path = ? WHERE id = ?',
+                   (thumb_path, preview_path, item_id))
+    # Sales recorded before the thumbnail existed
+    cursor.execute('UPDATE sales SET thumb_path = ? WHERE item_id = ? AND thumb_path IS NULL',
+                   (thumb_path, item_id))
+    query_cache.bump(cursor, 'stock_items', 'sales')
+
+
+def _process(run, item_id, image_path):
+    try:
+        paths = generate_variants(image_path)
+    except Exception as e:
+        print(f"Could not create thumbnails for {image_path}: {e}")
+        return None
+
+    try:
+        run(record_variants, item_id, paths['thumb'], paths['preview'])
+    except Exception as e:
+        print(f"Could not record thumbnails for {image_path}: {e}")
+        return None
+    return paths
+
+
+def _get_executor():
+    # Created lazily per process so forked workers do not share a dead pool
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='thumbnails')
+            _executor_pid = os.getpid()
+        return _executor
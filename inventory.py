@@ -0,0 +1,355 @@
+"""Inventory bookkeeping shared by the SQLite apps.
+
+The dashboard used to run COUNT/SUM scans over stock_items on every page
+load. Instead we keep a single-row ``inventory_summary`` that ``add_item``
+and ``sell_item`` update inside the same transaction as their own writes,
+so reading the dashboard costs one primary-key lookup.
+
+None of the helpers here commit; the caller owns the transaction.
+
+Run ``python inventory.py rebuild-summary [database_file]`` to recompute
+the summary from scratch and print any drift that had crept in.
+"""
+import json
+import sqlite3
+import sys
+
+import query_cache
+import sales_rollup
+import stock_alerts
+
+DEFAULT_DATABASE_FILE = '/tmp/stock_monitor.db'
+RECENT_ITEMS_LIMIT = 5
+
+# Each basket line binds seven parameters in checkout(); this stays well under
+# the 999-variable limit of older SQLite builds
+MAX_BASKET_LINES = 100
+
+# Fields compared when reporting drift between the stored and recomputed summary
+SUMMARY_FIELDS = ('total_items', 'total_quantity', 'current_stock_value', 'expected_revenue')
+
+
+def create_summary_table(cursor):
+    """Create the summary table and seed it from stock_items on first use"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_items INTEGER NOT NULL DEFAULT 0,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            current_stock_value REAL NOT NULL DEFAULT 0,
+            expected_revenue REAL NOT NULL DEFAULT 0,
+            recent_item_ids TEXT NOT NULL DEFAULT '[]',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('SELECT id FROM inventory_summary WHERE id = 1')
+    if not cursor.fetchone():
+        # Existing databases already have items, so start from real numbers
+        summary = compute_summary(cursor)
+        cursor.execute('''
+            INSERT INTO inventory_summary (id, total_items, total_quantity, current_stock_value,
+                                           expected_revenue, recent_item_ids)
+            VALUES (1, ?, ?, ?, ?, ?)
+        ''', (summary['total_items'], summary['total_quantity'], summary['current_stock_value'],
+              summary['expected_revenue'], json.dumps(summary['recent_item_ids'])))
+
+
+def add_stock_item(cursor, name, quantity, selling_price, description, image_path=None, reorder_level=0):
+    """Insert a stock item and fold it into the summary; returns the new item id"""
+    # current_stock_value and total_initial_value are generated by the database
+    cursor.execute('''
+        INSERT INTO stock_items (name, quantity, initial_quantity, selling_price, description, image_path,
+                                 reorder_level)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (name, quantity, quantity, selling_price, description, image_path, reorder_level))
+    item_id = cursor.lastrowid
+
+    record_item_added(cursor, item_id, quantity, selling_price)
+    stock_alerts.check_items(cursor, [item_id])
+    query_cache.bump(cursor, 'stock_items')
+    return item_id
+
+
+def record_item_added(cursor, item_id, quantity, selling_price):
+    """Fold a newly inserted stock item into the summary"""
+    record_items_added(cursor, [item_id], quantity, quantity * selling_price)
+
+
+def record_items_added(cursor, item_ids, total_quantity, total_value):
+    """Fold newly inserted stock items (oldest first) into the summary"""
+    # The INSERT that precedes this already holds the write lock, so this
+    # read-modify-write of the recent list cannot interleave with another writer
+    cursor.execute('SELECT recent_item_ids FROM inventory_summary WHERE id = 1')
+    row = cursor.fetchone()
+    recent_ids = json.loads(row[0]) if row else []
+    newest = list(reversed(item_ids[-RECENT_ITEMS_LIMIT:]))
+    recent_ids = (newest + [i for i in recent_ids if i not in newest])[:RECENT_ITEMS_LIMIT]
+
+    cursor.execute('''
+        UPDATE inventory_summary
+        SET total_items = total_items + ?,
+            total_quantity = total_quantity + ?,
+            current_stock_value = current_stock_value + ?,
+            expected_revenue = expected_revenue + ?,
+            recent_item_ids = ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    ''', (len(item_ids), total_quantity, total_value, total_value, json.dumps(recent_ids)))
+
+
+def record_item_sold(cursor, quantity_sold, selling_price):
+    """Take a sale's quantity and value out of the summary"""
+    record_sold_totals(cursor, quantity_sold, quantity_sold * selling_price)
+
+
+def record_sold_totals(cursor, quantity_sold, value):
+    """Take the combined quantity and value of one or more sales out of the summary"""
+    cursor.execute('''
+        UPDATE inventory_summary
+        SET total_quantity = total_quantity - ?,
+            current_stock_value = current_stock_value - ?,
+            expected_revenue = expected_revenue - ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    ''', (quantity_sold, value, value))
+
+
+def sell_stock(cursor, item_id, quantity_sold, user_id, user_name, user_email, place):
+    """Take quantity_sold units of an item and record the sale
+
+    The stock check and decrement are a single conditional UPDATE, so two
+    workers selling the last units of an item cannot both succeed and no
+    update is lost to a stale read. Returns the recorded sale as a dict,
+    or None when the item is missing or has too little stock; the caller
+    should roll back in that case and commit otherwise.
+    """
+    cursor.execute('''
+        UPDATE stock_items
+        SET quantity = quantity - ?
+        WHERE id = ? AND quantity >= ?
+    ''', (quantity_sold, item_id, quantity_sold))
+    if cursor.rowcount == 0:
+        return None
+
+    # Copy name and price from the row we just locked rather than from an earlier read
+    cursor.execute('''
+        INSERT INTO sales (item_id, item_name, quantity_sold, selling_price, total_amount,
+                           image_path, thumb_path, user_id, user_name, user_email, place)
+        SELECT id, name, ?, selling_price, ? * selling_price, image_path, thumb_path, ?, ?, ?, ?
+        FROM stock_items WHERE id = ?
+    ''', (quantity_sold, quantity_sold, user_id, user_name, user_email, place, item_id))
+    sale_id = cursor.lastrowid
+
+    cursor.execute('''
+        SELECT id, item_id, item_name, quantity_sold, selling_price, total_amount
+        FROM sales WHERE id = ?
+    ''', (sale_id,))
+    sale = dict(zip([d[0] for d in cursor.description], cursor.fetchone()))
+
+    record_item_sold(cursor, quantity_sold, sale['selling_price'])
+    sales_rollup.record_sales(cursor, sale_id)
+    stock_alerts.check_items(cursor, [item_id])
+    query_cache.bump(cursor, 'stock_items', 'sales')
+    return sale
+
+
+class CheckoutError(Exception):
+    """Raised when a basket cannot be sold; ``errors`` lists the problems per line"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def checkout(cursor, lines, user_id, user_name, user_email, place):
+    """Sell a whole basket of ``(item_id, quantity)`` lines in one transaction
+
+    Stock for every line is validated with one query, decremented with one
+    set-based conditional UPDATE and the sales rows are written with a
+    single executemany, so a 20-line basket costs a handful of statements
+    rather than 20 separate sales. Raises CheckoutError on any problem;
+    roll back in that case and commit otherwise.
+    """
+    quantities = {}
+    for item_id, quantity in lines:
+        if quantity <= 0:
+            raise CheckoutError([f'Quantity for item {item_id} must be at least 1'])
+        quantities[item_id] = quantities.get(item_id, 0) + quantity
+    if not quantities:
+        raise CheckoutError(['The basket is empty'])
+    if len(quantities) > MAX_BASKET_LINES:
+        raise CheckoutError([f'A basket can hold at most {MAX_BASKET_LINES} different items'])
+
+    item_ids = list(quantities)
+    placeholders = ','.join('?' * len(item_ids))
+
+    # Validate every line with one read
+    cursor.execute(f'''
+        SELECT id, name, quantity, selling_price, image_path, thumb_path
+        FROM stock_items WHERE id IN ({placeholders})
+    ''', item_ids)
+    items = {row[0]: row for row in cursor.fetchall()}
+
+    errors = []
+    for item_id, quantity in quantities.items():
+        item = items.get(item_id)
+        if item is None:
+            errors.append(f'Item {item_id} not found')
+        elif item[2] < quantity:
+            errors.append(f'Not enough stock for {item[1]} ({item[2]} available, {quantity} requested)')
+    if errors:
+        raise CheckoutError(errors)
+
+    # Decrement every line in one statement. The quantity guard still applies per
+    # row, so a concurrent sale that got there first shows up as a short rowcount
+    case_sql = 'CASE id ' + ' '.join('WHEN ? THEN ?' for _ in item_ids) + ' END'
+    case_params = [value for item_id in item_ids for value in (item_id, quantities[item_id])]
+    cursor.execute(f'''
+        UPDATE stock_items
+        SET quantity = quantity - ({case_sql})
+        WHERE id IN ({placeholders}) AND quantity >= ({case_sql})
+    ''', case_params + item_ids + case_params)
+    if cursor.rowcount != len(item_ids):
+        raise CheckoutError(['Stock changed during checkout, please try again'])
+
+    sale_rows = []
+    total_quantity = 0
+    total_amount = 0
+    for item_id in item_ids:
+        _, name, _, selling_price, image_path, thumb_path = items[item_id]
+        quantity = quantities[item_id]
+        amount = quantity * selling_price
+        sale_rows.append((item_id, name, quantity, selling_price, amount, image_path, thumb_path,
+                          user_id, user_name, user_email, place))
+        total_quantity += quantity
+        total_amount += amount
+
+    cursor.executemany('''
+        INSERT INTO sales (item_id, item_name, quantity_sold, selling_price, total_amount,
+                           image_path, thumb_path, user_id, user_name, user_email, place)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', sale_rows)
+    # The write lock is held, so AUTOINCREMENT gave the basket consecutive sale ids
+    cursor.execute('SELECT MAX(id) FROM sales')
+    last_sale_id = cursor.fetchone()[0]
+    sales_rollup.record_sales(cursor, last_sale_id - len(sale_rows) + 1, last_sale_id)
+
+    record_sold_totals(cursor, total_quantity, total_amount)
+    stock_alerts.check_items(cursor, item_ids)
+    query_cache.bump(cursor, 'stock_items', 'sales')
+    return {'lines': len(sale_rows), 'total_quantity': total_quantity, 'total_amount': total_amount}
+
+
+def get_summary(cursor):
+    """Read the dashboard numbers and recent items without scanning stock_items"""
+    cursor.execute('SELECT * FROM inventory_summary WHERE id = 1')
+    row = cursor.fetchone()
+    if not row:
+        return {'total_items': 0, 'total_quantity': 0, 'current_stock_value': 0,
+                'expected_revenue': 0, 'recent_items': []}
+
+    recent_ids = json.loads(row['recent_item_ids'])
+    recent_items = []
+    if recent_ids:
+        placeholders = ','.join('?' * len(recent_ids))
+        cursor.execute(f'SELECT * FROM stock_items WHERE id IN ({placeholders})', recent_ids)
+        by_id = {item['id']: item for item in cursor.fetchall()}
+        recent_items = [by_id[i] for i in recent_ids if i in by_id]
+
+    return {
+        'total_items': row['total_items'],
+        'total_quantity': row['total_quantity'],
+        'current_stock_value': row['current_stock_value'],
+        'expected_revenue': row['expected_revenue'],
+        'recent_items': recent_items,
+    }
+
+
+def get_stock_value(cursor):
+    """Current value of all stock, from the summary row"""
+    cursor.execute('SELECT current_stock_value FROM inventory_summary WHERE id = 1')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def compute_summary(cursor):
+    """Recompute the summary with a full scan of stock_items"""
+    # Expected revenue is the remaining stock at selling price, i.e. the stock value
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(quantity), 0),
+               COALESCE(SUM(current_stock_value), 0),
+               COALESCE(SUM(current_stock_value), 0)
+        FROM stock_items
+    ''')
+    total_items, total_quantity, current_stock_value, expected_revenue = cursor.fetchone()
+
+    cursor.execute('SELECT id FROM stock_items ORDER BY created_at DESC, id DESC LIMIT ?',
+                   (RECENT_ITEMS_LIMIT,))
+    recent_item_ids = [row[0] for row in cursor.fetchall()]
+
+    return {
+        'total_items': total_items,
+        'total_quantity': total_quantity,
+        'current_stock_value': current_stock_value,
+        'expected_revenue': expected_revenue,
+        'recent_item_ids': recent_item_ids,
+    }
+
+
+def rebuild_summary(conn):
+    """Recompute the summary from scratch and return the drift that was corrected
+
+    The result maps each drifted field to a ``(stored, actual)`` pair; an
+    empty dict means the incrementally maintained summary was accurate.
+    """
+    cursor = conn.cursor()
+    create_summary_table(cursor)
+
+    cursor.execute('SELECT * FROM inventory_summary WHERE id = 1')
+    stored = dict(zip([d[0] for d in cursor.description], cursor.fetchone()))
+    stored['recent_item_ids'] = json.loads(stored['recent_item_ids'])
+    actual = compute_summary(cursor)
+
+    drift = {}
+    for field in SUMMARY_FIELDS:
+        if abs((stored[field] or 0) - (actual[field] or 0)) > 1e-6:
+            drift[field] = (stored[field], actual[field])
+    if stored['recent_item_ids'] != actual['recent_item_ids']:
+        drift['recent_item_ids'] = (stored['recent_item_ids'], actual['recent_item_ids'])
+
+    cursor.execute('''
+        UPDATE inventory_summary
+        SET total_items = ?, total_quantity = ?, current_stock_value = ?,
+            expected_revenue = ?, recent_item_ids = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    ''', (actual['total_items'], actual['total_quantity'], actual['current_stock_value'],
+          actual['expected_revenue'], json.dumps(actual['recent_item_ids'])))
+    conn.commit()
+    return drift
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'rebuild-summary':
+        print(f"Usage: python {argv[0]} rebuild-summary [database_file]")
+        return 2
+
+    database_file = argv[2] if len(argv) > 2 else DEFAULT_DATABASE_FILE
+    conn = sqlite3.connect(database_file)
+    try:
+        drift = rebuild_summary(conn)
+    finally:
+        conn.close()
+
+    if not drift:
+        print(f"Inventory summary for {database_file} is accurate, no drift found")
+        return 0
+
+    print(f"Inventory summary for {database_file} had drifted and was rebuilt:")
+    for field, (stored, actual) in drift.items():
+        print(f"  {field}: stored={stored} actual={actual}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
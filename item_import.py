@@ -0,0 +1,253 @@
+"""Bulk import of stock items from a CSV file.
+
+Onboarding a supplier catalog through ``add_item`` took one form post,
+one connection and one commit per item. ``run_import`` reads the CSV a
+row at a time, validates each row and hands valid rows to ``write_batch``
+in groups of ``IMPORT_BATCH_SIZE``. Each group is one ``executemany`` and
+one summary update in its own transaction. Invalid rows are skipped and
+reported with their line number; they never stop the rest of the file.
+
+Columns (header names are case-insensitive): ``name``, ``quantity``,
+``selling_price`` (or ``price``), ``description`` and ``image`` (a file
+in static/uploads, or a ``static/uploads/...`` path). Only name, quantity
+and selling_price are required.
+
+Usage: python item_import.py sqlite <database file> <csv file> [--batch-size N] [--dry-run]
+       python item_import.py mysql <csv file> [--batch-size N] [--dry-run]
+"""
+import csv
+import math
+import os
+import sqlite3
+import sys
+import time
+
+import inventory
+import query_cache
+import stock_alerts
+
+BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+MAX_REPORTED_ERRORS = 1000
+UPLOAD_PREFIX = 'static/uploads/'
+MAX_NAME_LENGTH = 255
+
+COLUMN_ALIASES = {
+    'price': 'selling_price',
+    'image_path': 'image',
+    'image_reference': 'image',
+}
+REQUIRED_COLUMNS = ('name', 'quantity', 'selling_price')
+
+INSERT_SQL = '''
+    INSERT INTO stock_items (name, quantity, initial_quantity, selling_price, description, image_path)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {p})
+'''
+
+
+class ImportFailed(Exception):
+    """A batch could not be written; ``report`` covers the batches committed before it"""
+
+    def __init__(self, report, error):
+        super().__init__(f"{error} (after {report['imported']} items were imported)")
+        self.report = report
+
+
+def read_rows(lines):
+    """Yield (line number, row tuple or None, error or None) for each data row of a CSV"""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError('The file is empty')
+    columns = [COLUMN_ALIASES.get(c.strip().lower(), c.strip().lower()) for c in header]
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    index = {column: columns.index(column) for column in set(columns)}
+
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue  # blank line
+        line = reader.line_num
+        record = {column: values[i].strip() if i < len(values) else '' for column, i in index.items()}
+        try:
+            yield line, validate(record), None
+        except ValueError as e:
+            yield line, None, str(e)
+
+
+def validate(record):
+    """Turn a CSV record into (name, quantity, selling_price, description, image_path) or raise ValueError"""
+    name = record.get('name', '')
+    if not name:
+        raise ValueError('name is required')
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f'name is longer than {MAX_NAME_LENGTH} characters')
+
+    try:
+        quantity = int(record.get('quantity', ''))
+    except ValueError:
+        raise ValueError(f"quantity {record.get('quantity')!r} is not a whole number")
+    if quantity < 0:
+        raise ValueError('quantity cannot be negative')
+
+    try:
+        selling_price = float(record.get('selling_price', ''))
+    except ValueError:
+        raise ValueError(f"selling_price {record.get('selling_price')!r} is not a number")
+    if selling_price < 0 or not math.isfinite(selling_price):
+        raise ValueError('selling_price must be zero or more')
+
+    return (name, quantity, round(selling_price, 2), record.get('description', ''),
+            image_path(record.get('image', '')))
+
+
+def image_path(reference):
+    """Map an image reference to the stored image_path, or raise ValueError"""
+    if not reference:
+        return None
+    path = reference.replace('\\', '/')
+    if not path.startswith(UPLOAD_PREFIX):
+        path = UPLOAD_PREFIX + path
+    if '..' in path.split('/') or '://' in reference or reference.startswith('/'):
+        raise ValueError(f'image {reference!r} must be a file in {UPLOAD_PREFIX}')
+    return path
+
+
+def run_import(lines, write_batch, batch_size=BATCH_SIZE, dry_run=False):
+    """Validate the CSV in lines and pass valid rows to write_batch(rows) in batches
+
+    Returns a report dict with ``imported``, ``rejected``, ``errors`` (up to
+    MAX_REPORTED_ERRORS ``(line, message)`` pairs), ``batches`` and ``seconds``.
+    Raises ValueError for a file without the required header and
+    ImportFailed if a batch cannot be written.
+    """
+    started = time.perf_counter()
+    report = {'imported': 0, 'rejected': 0, 'errors': [], 'batches': 0}
+    batch = []
+
+    def flush():
+        if batch and not dry_run:
+            try:
+                write_batch(batch)
+            except Exception as e:
+                report['seconds'] = time.perf_counter() - started
+                raise ImportFailed(report, e)
+            report['batches'] += 1
+        report['imported'] += len(batch)
+        batch.clear()
+
+    for line, row, error in read_rows(lines):
+        if error is not None:
+            report['rejected'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append((line, error))
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+
+def insert_batch(cursor, rows):
+    """Insert validated rows into SQLite and fold them into the summary (the caller commits)"""
+    cursor.executemany(INSERT_SQL.format(p='?'), [
+        (name, quantity, quantity, selling_price, description, image)
+        for name, quantity, selling_price, description, image in rows
+    ])
+    # We hold the write lock, so AUTOINCREMENT gave the batch consecutive ids
+    cursor.execute('SELECT MAX(id) FROM stock_items')
+    last_id = cursor.fetchone()[0]
+    item_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+
+    total_quantity = sum(row[1] for row in rows)
+    total_value = sum(row[1] * row[2] for row in rows)
+    inventory.record_items_added(cursor, item_ids, total_quantity, total_value)
+    stock_alerts.check_item_range(cursor, item_ids[0], item_ids[-1])
+    query_cache.bump(cursor, 'stock_items')
+    return len(rows)
+
+
+def import_sqlite(database_file, lines, batch_size=BATCH_SIZE, dry_run=False):
+    """Import into a SQLite database, committing each batch"""
+    conn = sqlite3.connect(database_file)
+    conn.execute('PRAGMA busy_timeout = 5000')
+    try:
+        def write_batch(rows):
+            try:
+                insert_batch(conn.cursor(), rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return run_import(lines, write_batch, batch_size, dry_run)
+    finally:
+        conn.close()
+
+
+def import_mysql(lines, batch_size=BATCH_SIZE, dry_run=False):
+    """Import into MySQL, one execute_many() transaction per batch"""
+    from database import execute_many
+
+    def write_batch(rows):
+        execute_many(INSERT_SQL.format(p='%s'), [
+            (name, quantity, quantity, selling_price, description, image)
+            for name, quantity, selling_price, description, image in rows
+        ])
+    return run_import(lines, write_batch, batch_size, dry_run)
+
+
+def print_report(report):
+    verb = 'Validated' if report.get('dry_run') else 'Imported'
+    rate = report['imported'] / report['seconds'] if report['seconds'] else 0
+    print(f"{verb} {report['imported']} items in {report['seconds']:.2f}s ({rate:,.0f} rows/s), "
+          f"rejected {report['rejected']}")
+    for line, error in report['errors']:
+        print(f"  line {line}: {error}")
+    if report['rejected'] > len(report['errors']):
+        print(f"  ... and {report['rejected'] - len(report['errors'])} more")
+
+
+def main(argv):
+    args = []
+    batch_size = BATCH_SIZE
+    dry_run = False
+    remaining = iter(argv)
+    for arg in remaining:
+        if arg == '--batch-size':
+            batch_size = int(next(remaining, BATCH_SIZE))
+        elif arg == '--dry-run':
+            dry_run = True
+        else:
+            args.append(arg)
+
+    if len(args) == 3 and args[0] == 'sqlite':
+        database_file, path = args[1], args[2]
+    elif len(args) == 2 and args[0] == 'mysql':
+        database_file, path = None, args[1]
+    else:
+        print(__doc__.split('Usage: ', 1)[1].rstrip())
+        return 2
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        try:
+            if database_file:
+                report = import_sqlite(database_file, f, batch_size, dry_run)
+            else:
+                report = import_mysql(f, batch_size, dry_run)
+        except ValueError as e:
+            print(f"Cannot import {path}: {e}")
+            return 2
+        except ImportFailed as e:
+            print(f"Import of {path} failed: {e}")
+            print_report(e.report)
+            return 2
+    report['dry_run'] = dry_run
+    print_report(report)
+    return 1 if report['rejected'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,160 @@
+"""Full-text search over stock item names and descriptions.
+
+Finding a product meant scrolling the whole items list; the B-tree index
+on ``name`` only helps exact names and leading prefixes. Each database
+now keeps a full-text index that its engine maintains on every insert
+and update of ``stock_items``:
+
+- SQLite: the ``stock_items_fts`` FTS5 table (migration 0011), ranked by
+  bm25 with name matches weighted above description matches
+- MySQL: FULLTEXT indexes on ``name`` and ``(name, description)``
+  (migration 0003), queried in boolean mode
+
+Every word typed is matched as a prefix and all of them must match, so
+``blu wid`` finds "Blue Widget". ``/search?q=`` shows the ranked results
+and ``/search/autocomplete?q=`` answers with a short JSON list of
+matching names for search-as-you-type boxes.
+"""
+import re
+
+from flask import current_app, jsonify, redirect, render_template, request, session, url_for
+
+import query_cache
+import sqlite_db
+
+RESULTS_PER_PAGE = 25
+AUTOCOMPLETE_LIMIT = 8
+MAX_TERMS = 8
+NAME_WEIGHT = 10.0  # bm25 weight of a name match relative to a description match
+
+# InnoDB's default innodb_ft_min_token_size; shorter words are not in the index
+MYSQL_MIN_TOKEN_SIZE = 3
+
+RESULT_COLUMNS = ('id', 'name', 'description', 'quantity', 'selling_price', 'image_path', 'thumb_path')
+SUGGESTION_COLUMNS = ('id', 'name', 'quantity', 'selling_price')
+
+
+def terms(text):
+    """The words of a search box entry, lowercased, without FTS operators or punctuation"""
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def fts_query(words, column=None):
+    """An FTS5 MATCH expression requiring every word as a prefix"""
+    expression = ' '.join(f'"{word}"*' for word in words)
+    return f'{column} : ({expression})' if column else expression
+
+
+def search_sqlite(cursor, text, limit=RESULTS_PER_PAGE, offset=0):
+    """Items matching text in name or description, best match first"""
+    words = terms(text)
+    if not words:
+        return []
+    return _query_sqlite(cursor, RESULT_COLUMNS, fts_query(words), limit, offset)
+
+
+def autocomplete_sqlite(cursor, text, limit=AUTOCOMPLETE_LIMIT):
+    """Items whose name matches text, for search-as-you-type"""
+    words = terms(text)
+    if not words:
+        return []
+    return _query_sqlite(cursor, SUGGESTION_COLUMNS, fts_query(words, 'name'), limit)
+
+
+def _query_sqlite(cursor, columns, match, limit, offset=0):
+    # Sales bump stock_items too, so quantities in cached results stay current
+    rows = query_cache.cached_query(cursor, ('stock_items',), sqlite_sql(columns), (match, limit, offset))
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def sqlite_sql(columns):
+    """The FTS5 query behind the SQLite searches; takes (match, limit, offset)"""
+    return f'''
+        SELECT {', '.join('s.' + c for c in columns)}
+        FROM stock_items_fts f
+        JOIN stock_items s ON s.id = f.rowid
+        WHERE stock_items_fts MATCH ?
+        ORDER BY bm25(stock_items_fts, {NAME_WEIGHT}, 1.0), s.id
+        LIMIT ? OFFSET ?
+    '''
+
+
+def mysql_query(words):
+    """A boolean-mode AGAINST expression requiring every indexed word as a prefix"""
+    return ' '.join(f'+{word}*' for word in words if len(word) >= MYSQL_MIN_TOKEN_SIZE)
+
+
+def search_mysql(text, limit=RESULTS_PER_PAGE, offset=0):
+    """Items matching text in name or description, best match first"""
+    return _query_mysql(RESULT_COLUMNS, terms(text), 'name, description', limit, offset)
+
+
+def autocomplete_mysql(text, limit=AUTOCOMPLETE_LIMIT):
+    """Items whose name matches text, for search-as-you-type"""
+    return _query_mysql(SUGGESTION_COLUMNS, terms(text), 'name', limit)
+
+
+def _query_mysql(columns, words, match_columns, limit, offset=0):
+    from database import execute_query
+
+    if not words:
+        return []
+    sql, params = mysql_sql(columns, words, match_columns, limit, offset)
+    return [{c: row.get(c) for c in columns} for row in execute_query(sql, params, fetch_all=True)]
+
+
+def mysql_sql(columns, words, match_columns, limit, offset=0):
+    """The (sql, params) of a MySQL search for words, which must not be empty"""
+    against = mysql_query(words)
+    select = ', '.join(c for c in columns if c != 'thumb_path')
+    if not against:
+        # Only words too short for the full-text index: a name prefix on idx_name
+        return f'''
+            SELECT {select} FROM stock_items WHERE name LIKE %s ORDER BY name, id LIMIT %s OFFSET %s
+        ''', (_like_prefix(' '.join(words)), limit, offset)
+    return f'''
+        SELECT {select},
+               MATCH (name) AGAINST (%s IN BOOLEAN MODE) * {NAME_WEIGHT}
+               + MATCH ({match_columns}) AGAINST (%s IN BOOLEAN MODE) AS score
+        FROM stock_items
+        WHERE MATCH ({match_columns}) AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY score DESC, id
+        LIMIT %s OFFSET %s
+    ''', (against, against, against, limit, offset)
+
+
+def _like_prefix(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def init_app(app, dialect='sqlite'):
+    """Register /search and /search/autocomplete for a 'sqlite' or 'mysql' app"""
+    if dialect == 'mysql':
+        search, autocomplete = search_mysql, autocomplete_mysql
+    else:
+        def search(*args):
+            return search_sqlite(sqlite_db.get_db().cursor(), *args)
+
+        def autocomplete(*args):
+            return autocomplete_sqlite(sqlite_db.get_db().cursor(), *args)
+
+    def search_items():
+        if 'user_id' not in session:
+            return redirect(url_for('login'))
+        query = request.args.get('q', '').strip()
+        page = max(1, request.args.get('page', 1, type=int))
+        # One extra row tells us whether there is a next page
+        results = search(query, RESULTS_PER_PAGE + 1, (page - 1) * RESULTS_PER_PAGE) if query else []
+        return render_template('search.html', query=query, page=page,
+                               results=results[:RESULTS_PER_PAGE], has_next=len(results) > RESULTS_PER_PAGE,
+                               can_sell='sell_item' in current_app.view_functions)
+
+    def search_autocomplete():
+        if 'user_id' not in session:
+            return jsonify({'error': 'Login required'}), 401
+        limit = min(max(1, request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int)), RESULTS_PER_PAGE)
+        return jsonify(autocomplete(request.args.get('q', ''), limit))
+
+    app.add_url_rule('/search', 'search_items', search_items)
+    app.add_url_rule('/search/autocomplete', 'search_autocomplete', search_autocomplete)
+    app.jinja_env.globals['item_search_url'] = lambda: url_for('search_items')
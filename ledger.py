@@ -0,0 +1,111 @@
+"""Investor balance bookkeeping shared by the SQLite apps.
+
+``investor_balances`` holds one running-total row per investor, updated by
+``add_investment`` in the same transaction as the ledger insert. The
+investors page reads it directly instead of folding the whole
+investment_transactions table in Python.
+
+None of the helpers here commit; the caller owns the transaction.
+"""
+import query_cache
+
+# Grouped aggregate used to seed or rebuild the balances from the raw ledger
+BALANCES_FROM_LEDGER_SQL = '''
+    SELECT investor_name,
+           MAX(investor_email) as investor_email,
+           MAX(investor_phone) as investor_phone,
+           COALESCE(SUM(CASE WHEN transaction_type = 'invest' THEN amount END), 0) as total_invested,
+           COALESCE(SUM(CASE WHEN transaction_type != 'invest' THEN amount END), 0) as total_withdrawn,
+           COUNT(*) as transaction_count
+    FROM investment_transactions
+    WHERE investor_name IS NOT NULL
+    GROUP BY investor_name
+'''
+
+
+def create_balances_table(cursor):
+    """Create the balances table and seed it from the ledger on first use"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS investor_balances (
+            investor_name TEXT PRIMARY KEY,
+            investor_email TEXT,
+            investor_phone TEXT,
+            total_invested REAL NOT NULL DEFAULT 0,
+            total_withdrawn REAL NOT NULL DEFAULT 0,
+            balance REAL NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Serves the per-investor ledger page and the grouped rebuild
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_investment_investor_name
+        ON investment_transactions (investor_name, created_at)
+    ''')
+
+    cursor.execute('SELECT 1 FROM investor_balances LIMIT 1')
+    if not cursor.fetchone():
+        rebuild_balances(cursor)
+
+
+def rebuild_balances(cursor):
+    """Recompute every investor's totals with one grouped query over the ledger"""
+    cursor.execute('DELETE FROM investor_balances')
+    cursor.execute(f'''
+        INSERT INTO investor_balances (investor_name, investor_email, investor_phone,
+                                       total_invested, total_withdrawn, balance, transaction_count)
+        SELECT investor_name, investor_email, investor_phone, total_invested, total_withdrawn,
+               total_invested - total_withdrawn, transaction_count
+        FROM ({BALANCES_FROM_LEDGER_SQL})
+    ''')
+
+
+def record_transaction(cursor, investor_name, investor_email, investor_phone, transaction_type, amount):
+    """Apply one invest/withdraw transaction to the investor's running balance"""
+    invested = amount if transaction_type == 'invest' else 0
+    withdrawn = 0 if transaction_type == 'invest' else amount
+    cursor.execute('''
+        INSERT INTO investor_balances (investor_name, investor_email, investor_phone,
+                                       total_invested, total_withdrawn, balance, transaction_count)
+        VALUES (?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT (investor_name) DO UPDATE SET
+            investor_email = COALESCE(NULLIF(excluded.investor_email, ''), investor_email),
+            investor_phone = COALESCE(NULLIF(excluded.investor_phone, ''), investor_phone),
+            total_invested = total_invested + excluded.total_invested,
+            total_withdrawn = total_withdrawn + excluded.total_withdrawn,
+            balance = balance + excluded.balance,
+            transaction_count = transaction_count + 1,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (investor_name, investor_email, investor_phone, invested, withdrawn, invested - withdrawn))
+    query_cache.bump(cursor, 'investment_transactions', 'investor_balances')
+
+
+def get_balances(cursor):
+    """Return every investor's totals, shaped for investors.html"""
+    cursor.execute('''
+        SELECT investor_name as name, investor_email as email, investor_phone as phone,
+               total_invested, total_withdrawn, balance, transaction_count
+        FROM investor_balances
+        ORDER BY investor_name
+    ''')
+    return cursor.fetchall()
+
+
+def get_balance(cursor, investor_name):
+    """Return one investor's totals, or zeros if they have no transactions"""
+    cursor.execute('''
+        SELECT total_invested, total_withdrawn, balance, transaction_count
+        FROM investor_balances WHERE investor_name = ?
+    ''', (investor_name,))
+    row = cursor.fetchone()
+    if not row:
+        return {'total_invested': 0, 'total_withdrawn': 0, 'balance': 0, 'transaction_count': 0}
+    return {'total_invested': row[0], 'total_withdrawn': row[1], 'balance': row[2],
+            'transaction_count': row[3]}
+
+
+def get_net_investment(cursor):
+    """Net amount invested across all investors"""
+    cursor.execute('SELECT COALESCE(SUM(balance), 0) FROM investor_balances')
+    return cursor.fetchone()[0]
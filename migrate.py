@@ -0,0 +1,234 @@
+"""Versioned schema migrations for the SQLite and MySQL databases.
+
+Migrations live in ``migrations/<dialect>/`` as numbered files:
+
+- ``NNNN_name.sql`` - statements separated by ``;``; MySQL-client style
+  ``DELIMITER`` lines are honoured so triggers and procedures can be
+  written the usual way
+- ``NNNN_name.py`` - a module with ``upgrade(cursor)`` for changes that
+  need code (seeding, conditional ALTERs)
+
+Applied versions are recorded with a checksum of the file in
+``schema_migrations``. On a warm start every migration is already
+recorded and ``migrate_sqlite``/``migrate_mysql`` cost a single SELECT.
+Pending migrations are applied under a lock (``BEGIN IMMEDIATE`` on
+SQLite, ``GET_LOCK`` on MySQL) so concurrently booting workers apply each
+one exactly once.
+
+SQLite applies everything pending in one transaction. MySQL commits DDL
+implicitly, so each migration is recorded as soon as it finishes and
+should be safe to re-run if it fails part way.
+
+Usage: python migrate.py sqlite <database file>
+       python migrate.py mysql
+"""
+import hashlib
+import importlib.util
+import os
+import re
+import sqlite3
+import sys
+from collections import namedtuple
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MYSQL_LOCK_NAME = 'stock_monitor_migrations'
+MYSQL_LOCK_TIMEOUT = 60  # seconds another worker may hold the migration lock
+
+Migration = namedtuple('Migration', 'version name path checksum')
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.(sql|py)$')
+
+SCHEMA_MIGRATIONS_SQL = {
+    'sqlite': '''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'mysql': '''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''',
+}
+
+PLACEHOLDERS = {'sqlite': '?', 'mysql': '%s'}
+
+
+def discover(dialect):
+    """Return the dialect's migrations sorted by version"""
+    directory = os.path.join(MIGRATIONS_DIR, dialect)
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append(Migration(int(match.group(1)), match.group(2), path, checksum))
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f'Duplicate migration versions in {directory}')
+    return sorted(migrations)
+
+
+def split_statements(sql):
+    """Split a SQL script into statements, honouring DELIMITER lines"""
+    statements = []
+    delimiter = ';'
+    current = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        if stripped.startswith('--') or (not current and not stripped):
+            continue
+        if stripped.endswith(delimiter):
+            current.append(line.rstrip()[:-len(delimiter)])
+            statements.append('\n'.join(current).strip())
+            current = []
+        else:
+            current.append(line)
+
+    tail = '\n'.join(current).strip()
+    if tail:
+        statements.append(tail)
+    return [s for s in statements if s]
+
+
+def pending(migrations, applied):
+    """Return the migrations not yet in applied ({version: checksum}), warning about edited ones"""
+    todo = []
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is None:
+            todo.append(migration)
+        elif checksum != migration.checksum:
+            print(f"Warning: migration {migration.version}_{migration.name} changed after it was applied")
+    return todo
+
+
+def apply(cursor, migration):
+    """Run one migration file on cursor (the caller records and commits it)"""
+    if migration.path.endswith('.py'):
+        spec = importlib.util.spec_from_file_location(f'migration_{migration.version}_{migration.name}',
+                                                      migration.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(cursor)
+        return
+
+    with open(migration.path, encoding='utf-8') as f:
+        for statement in split_statements(f.read()):
+            cursor.execute(statement)
+
+
+def record(cursor, migration, dialect):
+    p = PLACEHOLDERS[dialect]
+    cursor.execute(f'INSERT INTO schema_migrations (version, name, checksum) VALUES ({p}, {p}, {p})',
+                   (migration.version, migration.name, migration.checksum))
+
+
+def _applied(cursor):
+    cursor.execute('SELECT version, checksum FROM schema_migrations')
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def migrate_sqlite(database_file):
+    """Bring a SQLite database up to date; returns the versions applied"""
+    migrations = discover('sqlite')
+    conn = sqlite3.connect(database_file, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+
+        # Warm start: one read and nothing else
+        try:
+            if not pending(migrations, _applied(cursor)):
+                return []
+        except sqlite3.OperationalError:
+            pass  # no schema_migrations table yet
+
+        conn.execute('PRAGMA busy_timeout = 30000')
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute(SCHEMA_MIGRATIONS_SQL['sqlite'])
+            # Another worker may have migrated while we waited for the lock
+            todo = pending(migrations, _applied(cursor))
+            for migration in todo:
+                print(f"Applying migration {migration.version}_{migration.name}")
+                apply(cursor, migration)
+                record(cursor, migration, 'sqlite')
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        return [m.version for m in todo]
+    finally:
+        conn.close()
+
+
+def migrate_mysql(conn):
+    """Bring the MySQL database behind conn up to date; returns the versions applied"""
+    from mysql.connector import Error
+
+    migrations = discover('mysql')
+    cursor = conn.cursor()
+    try:
+        # Warm start: one read and nothing else
+        try:
+            if not pending(migrations, _applied(cursor)):
+                return []
+        except Error:
+            pass  # no schema_migrations table yet
+
+        cursor.execute('SELECT GET_LOCK(%s, %s)', (MYSQL_LOCK_NAME, MYSQL_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError('Timed out waiting for the migration lock')
+        try:
+            cursor.execute(SCHEMA_MIGRATIONS_SQL['mysql'])
+            # Another worker may have migrated while we waited for the lock
+            todo = pending(migrations, _applied(cursor))
+            for migration in todo:
+                print(f"Applying migration {migration.version}_{migration.name}")
+                apply(cursor, migration)
+                record(cursor, migration, 'mysql')
+                conn.commit()
+        finally:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (MYSQL_LOCK_NAME,))
+            cursor.fetchone()
+        return [m.version for m in todo]
+    finally:
+        cursor.close()
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == 'sqlite':
+        applied = migrate_sqlite(argv[1])
+    elif argv[:1] == ['mysql']:
+        from database import get_db_connection
+        conn = get_db_connection()
+        try:
+            applied = migrate_mysql(conn)
+        finally:
+            conn.close()
+    else:
+        print(__doc__.split('Usage: ', 1)[1].rstrip())
+        return 2
+
+    if applied:
+        print(f"Applied migrations: {', '.join(map(str, applied))}")
+    else:
+        print("Schema is up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,70 @@
+"""Replace the stock value triggers with stored generated columns.
+
+The AFTER INSERT/UPDATE triggers ran a second UPDATE on stock_items for
+every write to it, which MySQL rejects at runtime.
+current_stock_value and total_initial_value are now STORED generated
+columns, with a covering index for the dashboard and investment totals.
+
+Each step checks the live schema first, so a run that failed part way can
+simply be retried.
+"""
+
+TRIGGERS = ('update_stock_value_after_insert', 'update_stock_value_after_update')
+
+GENERATED_COLUMNS = (
+    ('total_initial_value', 'DECIMAL(12,2) AS (initial_quantity * selling_price) STORED'),
+    ('current_stock_value', 'DECIMAL(12,2) AS (quantity * selling_price) STORED'),
+)
+
+INDEXES = (
+    ('stock_items', 'idx_stock_values', '(current_stock_value, total_initial_value, quantity)'),
+    ('investment_transactions', 'idx_transaction_type_amount', '(transaction_type, amount)'),
+)
+
+
+def _column_extra(cursor, table, column):
+    # Returns None if the column is missing, else its EXTRA ('STORED GENERATED' etc.)
+    cursor.execute('''
+        SELECT EXTRA FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    ''', (table, column))
+    row = cursor.fetchone()
+    return None if row is None else (row[0] or '')
+
+
+def _has_index(cursor, table, index):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    ''', (table, index))
+    return cursor.fetchone() is not None
+
+
+def upgrade(cursor):
+    for trigger in TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+    if _column_extra(cursor, 'stock_items', 'initial_quantity') is None:
+        cursor.execute('ALTER TABLE stock_items ADD COLUMN initial_quantity INT NOT NULL DEFAULT 0 AFTER quantity')
+        # Recover it from the recorded initial value, or from stock left plus units sold
+        cursor.execute('''
+            UPDATE stock_items
+            SET initial_quantity = CASE
+                WHEN selling_price > 0 AND total_initial_value > 0
+                    THEN ROUND(total_initial_value / selling_price)
+                ELSE quantity + (SELECT COALESCE(SUM(s.quantity_sold), 0) FROM sales s
+                                 WHERE s.item_id = stock_items.id)
+            END
+        ''')
+
+    for column, definition in GENERATED_COLUMNS:
+        extra = _column_extra(cursor, 'stock_items', column)
+        if extra is not None and 'GENERATED' in extra.upper():
+            continue
+        drop = f'DROP COLUMN {column}, ' if extra is not None else ''
+        cursor.execute(f'ALTER TABLE stock_items {drop}ADD COLUMN {column} {definition}')
+
+    for table, index, columns in INDEXES:
+        if not _has_index(cursor, table, index):
+            cursor.execute(f'ALTER TABLE {table} ADD INDEX {index} {columns}')
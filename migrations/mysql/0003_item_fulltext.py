@@ -0,0 +1,29 @@
+"""FULLTEXT indexes for item_search.py.
+
+InnoDB maintains them on every insert and update of stock_items. The
+name-only index ranks name matches above description matches and serves
+autocomplete.
+
+Each index is checked for first, so a run that failed part way can simply
+be retried.
+"""
+
+INDEXES = (
+    ('ft_stock_items_name', '(name)'),
+    ('ft_stock_items_name_description', '(name, description)'),
+)
+
+
+def _has_index(cursor, table, index):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    ''', (table, index))
+    return cursor.fetchone() is not None
+
+
+def upgrade(cursor):
+    for index, columns in INDEXES:
+        if not _has_index(cursor, 'stock_items', index):
+            cursor.execute(f'ALTER TABLE stock_items ADD FULLTEXT INDEX {index} {columns}')
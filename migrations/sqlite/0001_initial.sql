@@ -0,0 +1,68 @@
+-- SQLite schema for the Stock Monitor apps
+
+-- Users table for authentication
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    email TEXT,
+    profile_image TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Stock items table for inventory management
+CREATE TABLE IF NOT EXISTS stock_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    selling_price REAL NOT NULL,
+    description TEXT,
+    image_path TEXT,
+    total_initial_value REAL,
+    current_stock_value REAL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Sales table for transaction records
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER,
+    item_name TEXT,
+    quantity_sold INTEGER,
+    selling_price REAL,
+    total_amount REAL,
+    image_path TEXT,
+    sale_image_path TEXT,
+    user_id INTEGER,
+    user_name TEXT,
+    user_email TEXT,
+    place TEXT,
+    sold_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Investment transactions table for investor tracking
+CREATE TABLE IF NOT EXISTS investment_transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_type TEXT,
+    amount REAL,
+    description TEXT,
+    investor_name TEXT,
+    investor_email TEXT,
+    investor_phone TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Wages table for employee payment tracking
+CREATE TABLE IF NOT EXISTS wages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_name TEXT,
+    amount REAL,
+    wage_type TEXT,
+    description TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indexes that drive keyset pagination of the history pages
+CREATE INDEX IF NOT EXISTS idx_sales_sold_at ON sales (sold_at);
+CREATE INDEX IF NOT EXISTS idx_wages_created_at ON wages (created_at);
+CREATE INDEX IF NOT EXISTS idx_investment_created_at ON investment_transactions (created_at);
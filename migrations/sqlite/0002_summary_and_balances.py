@@ -0,0 +1,79 @@
+"""Dashboard summary row and per-investor balances, seeded from existing data
+
+The SQL is a copy of what inventory.py and ledger.py ran when this
+migration was written, so later changes to those modules cannot change
+what it does to a fresh database.
+"""
+
+CREATE_SUMMARY_SQL = '''
+    CREATE TABLE IF NOT EXISTS inventory_summary (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_items INTEGER NOT NULL DEFAULT 0,
+        total_quantity INTEGER NOT NULL DEFAULT 0,
+        current_stock_value REAL NOT NULL DEFAULT 0,
+        expected_revenue REAL NOT NULL DEFAULT 0,
+        recent_item_ids TEXT NOT NULL DEFAULT '[]',
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Existing databases already have items, so start from real numbers;
+# expected revenue is the remaining stock at selling price
+SEED_SUMMARY_SQL = '''
+    INSERT OR IGNORE INTO inventory_summary (id, total_items, total_quantity, current_stock_value,
+                                             expected_revenue, recent_item_ids)
+    SELECT 1, COUNT(*), COALESCE(SUM(quantity), 0),
+           COALESCE(SUM(current_stock_value), 0),
+           COALESCE(SUM(current_stock_value), 0),
+           (SELECT json_group_array(id)
+            FROM (SELECT id FROM stock_items ORDER BY created_at DESC, id DESC LIMIT 5))
+    FROM stock_items
+'''
+
+CREATE_BALANCES_SQL = '''
+    CREATE TABLE IF NOT EXISTS investor_balances (
+        investor_name TEXT PRIMARY KEY,
+        investor_email TEXT,
+        investor_phone TEXT,
+        total_invested REAL NOT NULL DEFAULT 0,
+        total_withdrawn REAL NOT NULL DEFAULT 0,
+        balance REAL NOT NULL DEFAULT 0,
+        transaction_count INTEGER NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Serves the per-investor ledger page and the grouped rebuild
+CREATE_LEDGER_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_investment_investor_name
+    ON investment_transactions (investor_name, created_at)
+'''
+
+SEED_BALANCES_SQL = '''
+    INSERT INTO investor_balances (investor_name, investor_email, investor_phone,
+                                   total_invested, total_withdrawn, balance, transaction_count)
+    SELECT investor_name, investor_email, investor_phone, total_invested, total_withdrawn,
+           total_invested - total_withdrawn, transaction_count
+    FROM (
+        SELECT investor_name,
+               MAX(investor_email) as investor_email,
+               MAX(investor_phone) as investor_phone,
+               COALESCE(SUM(CASE WHEN transaction_type = 'invest' THEN amount END), 0) as total_invested,
+               COALESCE(SUM(CASE WHEN transaction_type != 'invest' THEN amount END), 0) as total_withdrawn,
+               COUNT(*) as transaction_count
+        FROM investment_transactions
+        WHERE investor_name IS NOT NULL
+        GROUP BY investor_name
+    )
+'''
+
+
+def upgrade(cursor):
+    cursor.execute(CREATE_SUMMARY_SQL)
+    cursor.execute(SEED_SUMMARY_SQL)
+
+    cursor.execute(CREATE_BALANCES_SQL)
+    cursor.execute(CREATE_LEDGER_INDEX_SQL)
+    cursor.execute('SELECT 1 FROM investor_balances LIMIT 1')
+    if not cursor.fetchone():
+        cursor.execute(SEED_BALANCES_SQL)
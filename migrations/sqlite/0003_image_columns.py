@@ -0,0 +1,13 @@
+"""Add the photo columns full_app uses to databases first created by stable_app"""
+
+COLUMNS = (
+    ('users', 'profile_image'),
+    ('sales', 'sale_image_path'),
+)
+
+
+def upgrade(cursor):
+    for table, column in COLUMNS:
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} TEXT')
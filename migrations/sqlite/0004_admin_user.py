@@ -0,0 +1,10 @@
+"""Create the default admin account (password admin123) if there is none"""
+from werkzeug.security import generate_password_hash
+
+
+def upgrade(cursor):
+    cursor.execute('SELECT id FROM users WHERE username = ?', ('admin',))
+    if not cursor.fetchone():
+        cursor.execute('INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)',
+                       ('admin', generate_password_hash('admin123'), 'admin@stockmonitor.com'))
+        print("Admin user created")
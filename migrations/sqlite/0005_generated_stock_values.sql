@@ -0,0 +1,38 @@
+-- Stock values become stored generated columns, so no code (or trigger) has
+-- to keep them in step with quantity and price. SQLite can only add STORED
+-- generated columns by rebuilding the table.
+
+-- initial_quantity is recovered from the recorded initial value, or failing
+-- that from the current quantity plus everything sold since
+CREATE TABLE stock_items_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    initial_quantity INTEGER NOT NULL DEFAULT 0,
+    selling_price REAL NOT NULL,
+    description TEXT,
+    image_path TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    total_initial_value REAL GENERATED ALWAYS AS (initial_quantity * selling_price) STORED,
+    current_stock_value REAL GENERATED ALWAYS AS (quantity * selling_price) STORED
+);
+
+INSERT INTO stock_items_new (id, name, quantity, initial_quantity, selling_price, description, image_path, created_at)
+SELECT id, name, quantity,
+       CASE WHEN selling_price > 0 AND total_initial_value > 0
+            THEN CAST(ROUND(total_initial_value / selling_price) AS INTEGER)
+            ELSE quantity + COALESCE((SELECT SUM(quantity_sold) FROM sales WHERE sales.item_id = stock_items.id), 0)
+       END,
+       selling_price, description, image_path, created_at
+FROM stock_items;
+
+-- Keep AUTOINCREMENT from reusing the ids of deleted items
+UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = 'stock_items')
+WHERE name = 'stock_items_new' AND EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'stock_items');
+
+DROP TABLE stock_items;
+ALTER TABLE stock_items_new RENAME TO stock_items;
+
+-- No covering index here: SQLite's planner does not use indexes on generated
+-- columns as covering, and the dashboard and investment totals are read from
+-- inventory_summary instead of aggregating stock_items
@@ -0,0 +1,11 @@
+-- Per-table write counters; query_cache and conditional GETs compare
+-- against these instead of re-reading the tables themselves
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO table_versions (table_name, version) VALUES
+    ('stock_items', 1), ('sales', 1), ('wages', 1),
+    ('investment_transactions', 1), ('investor_balances', 1);
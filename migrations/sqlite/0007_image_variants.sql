@@ -0,0 +1,4 @@
+-- Resized copies of item photos written by images.py
+ALTER TABLE stock_items ADD COLUMN thumb_path TEXT;
+ALTER TABLE stock_items ADD COLUMN preview_path TEXT;
+ALTER TABLE sales ADD COLUMN thumb_path TEXT;
@@ -0,0 +1,23 @@
+-- Sales pre-aggregated per day, item and seller; sales_rollup.py keeps it
+-- current on every sale so revenue reports never scan the sales table.
+-- A missing item or seller is stored as 0 so it can be part of the key.
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day TEXT NOT NULL,
+    item_id INTEGER NOT NULL DEFAULT 0,
+    user_id INTEGER NOT NULL DEFAULT 0,
+    item_name TEXT,
+    user_name TEXT,
+    sales_count INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, item_id, user_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_sales_daily_item ON sales_daily (item_id, day);
+
+INSERT INTO sales_daily (day, item_id, user_id, item_name, user_name, sales_count, units, revenue)
+SELECT date(sold_at), COALESCE(item_id, 0), COALESCE(user_id, 0), MAX(item_name), MAX(user_name),
+       COUNT(*), COALESCE(SUM(quantity_sold), 0), COALESCE(SUM(total_amount), 0)
+FROM sales
+WHERE sold_at IS NOT NULL
+GROUP BY date(sold_at), COALESCE(item_id, 0), COALESCE(user_id, 0);
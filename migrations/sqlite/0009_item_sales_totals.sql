@@ -0,0 +1,15 @@
+-- Running sales counters per item; sales_rollup.py adds every sale to them
+-- so "how much has this item sold, and when last" is a primary-key lookup.
+CREATE TABLE IF NOT EXISTS item_sales_totals (
+    item_id INTEGER PRIMARY KEY,
+    sales_count INTEGER NOT NULL DEFAULT 0,
+    units_sold INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    last_sold_at DATETIME
+);
+
+INSERT INTO item_sales_totals (item_id, sales_count, units_sold, revenue, last_sold_at)
+SELECT item_id, COUNT(*), COALESCE(SUM(quantity_sold), 0), COALESCE(SUM(total_amount), 0), MAX(sold_at)
+FROM sales
+WHERE item_id IS NOT NULL
+GROUP BY item_id;
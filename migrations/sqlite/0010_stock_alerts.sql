@@ -0,0 +1,17 @@
+-- Per-item reorder levels and the open low-stock alerts kept by stock_alerts.py.
+-- A level of 0 alerts only when the item runs out.
+ALTER TABLE stock_items ADD COLUMN reorder_level INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS stock_alerts (
+    item_id INTEGER PRIMARY KEY,
+    item_name TEXT,
+    quantity INTEGER NOT NULL,
+    reorder_level INTEGER NOT NULL,
+    level TEXT NOT NULL CHECK (level IN ('low', 'out')),
+    raised_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO stock_alerts (item_id, item_name, quantity, reorder_level, level)
+SELECT id, name, quantity, reorder_level, CASE WHEN quantity <= 0 THEN 'out' ELSE 'low' END
+FROM stock_items
+WHERE quantity <= reorder_level;
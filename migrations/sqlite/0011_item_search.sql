@@ -0,0 +1,28 @@
+-- Full-text index over item names and descriptions for item_search.py.
+-- An external-content FTS5 table stores only the index; triggers keep it in
+-- step with stock_items. Sales only change quantity, so they never touch it.
+-- prefix='2 3' indexes two- and three-letter prefixes for autocomplete.
+CREATE VIRTUAL TABLE IF NOT EXISTS stock_items_fts USING fts5(
+    name, description,
+    content='stock_items', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+DELIMITER $$
+CREATE TRIGGER IF NOT EXISTS stock_items_fts_insert AFTER INSERT ON stock_items BEGIN
+    INSERT INTO stock_items_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+END$$
+
+CREATE TRIGGER IF NOT EXISTS stock_items_fts_delete AFTER DELETE ON stock_items BEGIN
+    INSERT INTO stock_items_fts (stock_items_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+END$$
+
+CREATE TRIGGER IF NOT EXISTS stock_items_fts_update AFTER UPDATE OF name, description ON stock_items BEGIN
+    INSERT INTO stock_items_fts (stock_items_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO stock_items_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+END$$
+DELIMITER ;
+
+INSERT INTO stock_items_fts (stock_items_fts) VALUES ('rebuild');
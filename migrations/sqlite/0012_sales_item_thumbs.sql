@@ -0,0 +1,3 @@
+-- images.py fills in the thumbnail of an item's earlier sales by item_id;
+-- only sales still without one are ever looked up, so only they are indexed
+CREATE INDEX IF NOT EXISTS idx_sales_item_no_thumb ON sales (item_id) WHERE thumb_path IS NULL;
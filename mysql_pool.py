@@ -0,0 +1,290 @@
+"""A bounded, observable MySQL connection pool.
+
+mysql.connector's built-in pool fails immediately when it is exhausted,
+which database.py papered over with sleep-and-retry loops in the request
+thread and then an unpooled direct connection. ``ConnectionPool`` instead:
+
+- waits for a free connection for at most ``wait_timeout`` seconds
+- pings connections that sat idle longer than ``ping_interval`` before
+  handing them out, and drops ones that fail
+- closes connections idle longer than ``max_idle`` (down to ``min_size``)
+  and recycles any older than ``max_lifetime``
+- keeps live stats: open/in-use/idle counts, waiters, a wait-time
+  histogram, timeouts and connect failures
+- stops dialing MySQL through a ``CircuitBreaker`` after repeated connect
+  failures, so a database outage fails requests fast instead of stalling
+  every worker
+
+Connections handed out are ``PooledConnection`` wrappers; ``close()`` rolls
+back anything uncommitted and returns the connection to the pool.
+"""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+# Upper bounds (ms) of the wait-time histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolError(Exception):
+    """A connection could not be checked out of the pool"""
+
+
+class PoolTimeout(PoolError):
+    """Every connection stayed busy for the whole wait timeout"""
+
+
+class PoolUnavailable(PoolError):
+    """MySQL is unreachable (connect failed or the circuit breaker is open)"""
+
+
+class CircuitBreaker:
+    """Trip after failure_threshold consecutive failures, retry after reset_timeout"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a connection attempt may be made now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let a single trial connection through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"MySQL circuit breaker opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class PooledConnection:
+    """Wraps a mysql.connector connection; close() returns it to the pool"""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = created_at
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.release(self)
+
+
+class ConnectionPool:
+    """Thread-safe MySQL pool with bounded waits, health checks and stats"""
+
+    def __init__(self, config, size=5, min_size=1, wait_timeout=5, ping_interval=30,
+                 max_idle=300, max_lifetime=1800, breaker=None):
+        self.config = config
+        self.size = size
+        self.min_size = min(min_size, size)
+        self.wait_timeout = wait_timeout
+        self.ping_interval = ping_interval
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.breaker = breaker or CircuitBreaker()
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (raw, created_at, last_used), most recently used on the right
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connect_failures = 0
+        self.discarded = 0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def get_connection(self):
+        """Check out a connection, waiting at most wait_timeout seconds"""
+        started = time.monotonic()
+        deadline = started + self.wait_timeout
+
+        raw, created_at, last_used = self._take_or_reserve(deadline)
+        if raw is None:
+            raw, created_at = self._open_connection(), time.monotonic()
+        elif not self._is_healthy(raw, created_at, last_used):
+            # Swap a stale connection for a fresh one in the same slot
+            self._close_quietly(raw)
+            with self._cond:
+                self.discarded += 1
+            if not self.breaker.allow():
+                self._free_slot()
+                raise PoolUnavailable('MySQL is unavailable (circuit breaker open)')
+            raw, created_at = self._open_connection(), time.monotonic()
+
+        with self._cond:
+            self._in_use += 1
+            self.checkouts += 1
+            self._record_wait(time.monotonic() - started)
+        return PooledConnection(self, raw, created_at)
+
+    def release(self, conn):
+        """Return a checked-out connection to the pool"""
+        raw = conn._raw
+        keep = time.monotonic() - conn.created_at < self.max_lifetime
+        if keep:
+            try:
+                raw.rollback()
+            except Error:
+                keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((raw, conn.created_at, time.monotonic()))
+            else:
+                self._open -= 1
+                self.discarded += 1
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            histogram = {f'<={bound}ms': count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_histogram)}
+            histogram[f'>{WAIT_BUCKETS_MS[-1]}ms'] = self.wait_histogram[-1]
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiters': self._waiters,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connect_failures': self.connect_failures,
+                'discarded': self.discarded,
+                'wait_histogram': histogram,
+                'breaker': self.breaker.state,
+            }
+
+    def close_all(self):
+        """Close idle connections (checked-out ones close when released)"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            self._close_quietly(raw)
+
+    def _take_or_reserve(self, deadline):
+        # Returns an idle (raw, created_at, last_used), or (None, None, None)
+        # after reserving a slot for a new connection
+        expired = []
+        try:
+            with self._cond:
+                while True:
+                    expired.extend(self._evict_idle())
+                    if self._idle:
+                        return self._idle.pop()
+                    if self._open < self.size:
+                        if not self.breaker.allow():
+                            raise PoolUnavailable('MySQL is unavailable (circuit breaker open)')
+                        self._open += 1
+                        return None, None, None
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f'No MySQL connection free after {self.wait_timeout}s '
+                                          f'({self._in_use} in use)')
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+        finally:
+            for raw in expired:
+                self._close_quietly(raw)
+
+    def _evict_idle(self):
+        # Called with the lock held; oldest-used connections sit on the left
+        now = time.monotonic()
+        expired = []
+        while self._idle and self._open > self.min_size:
+            raw, created_at, last_used = self._idle[0]
+            if now - last_used < self.max_idle and now - created_at < self.max_lifetime:
+                break
+            self._idle.popleft()
+            self._open -= 1
+            self.discarded += 1
+            expired.append(raw)
+        return expired
+
+    def _is_healthy(self, raw, created_at, last_used):
+        now = time.monotonic()
+        if now - created_at >= self.max_lifetime:
+            return False
+        if now - last_used < self.ping_interval:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _open_connection(self):
+        # The caller has already reserved a slot; give it back on failure
+        try:
+            raw = mysql.connector.connect(**self.config)
+        except Exception as e:
+            # Any failure counts, or a half-open breaker would never leave its trial
+            self.breaker.record_failure()
+            self._free_slot(connect_failed=True)
+            if isinstance(e, Error):
+                raise PoolUnavailable(f'Could not connect to MySQL: {e}') from e
+            raise
+        self.breaker.record_success()
+        return raw
+
+    def _free_slot(self, connect_failed=False):
+        with self._cond:
+            self._open -= 1
+            if connect_failed:
+                self.connect_failures += 1
+            self._cond.notify()
+
+    def _record_wait(self, seconds):
+        ms = seconds * 1000
+        for index, bound in enumerate(WAIT_BUCKETS_MS):
+            if ms <= bound:
+                self.wait_histogram[index] += 1
+                return
+        self.wait_histogram[-1] += 1
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Error:
+            pass
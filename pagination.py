@@ -0,0 +1,138 @@
+"""Keyset (cursor) pagination for the history tables.
+
+Pages are ordered newest first by ``(order_column, id)``. A cursor token is
+the position of the row at a page edge, so fetching the next page is an
+index range scan that costs the same on page 1 and page 10,000, unlike
+OFFSET which re-reads every skipped row.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value, row_id):
+    """Encode a row position as an opaque, URL-safe token"""
+    payload = json.dumps([sort_value, row_id], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token from encode_cursor, returning None if it is malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_date(value):
+    """Return a YYYY-MM-DD string for a date filter, or None if absent or invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def page_size_from(value):
+    """Clamp a requested page size to something sensible"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def page_args(args):
+    """Pull cursor, date filter and page size arguments from a request's query string"""
+    return {
+        'after': args.get('after'),
+        'before': args.get('before'),
+        'start_date': parse_date(args.get('start')),
+        'end_date': parse_date(args.get('end')),
+        'page_size': page_size_from(args.get('per_page')),
+    }
+
+
+def date_range_clause(order_column, start_date=None, end_date=None, placeholder='?'):
+    """Build WHERE conditions for an inclusive date range on order_column"""
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append(f'{order_column} >= {placeholder}')
+        params.append(start_date)
+    if end_date:
+        # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS', so "before the next day"
+        # keeps the end date inclusive and still compares lexicographically
+        next_day = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+        conditions.append(f'{order_column} < {placeholder}')
+        params.append(next_day.strftime('%Y-%m-%d'))
+    return conditions, params
+
+
+def date_filter(order_column, start_date=None, end_date=None, placeholder='?'):
+    """Return a ``WHERE`` clause (or '') and params for aggregates over the same range"""
+    conditions, params = date_range_clause(order_column, start_date, end_date, placeholder)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where, params
+
+
+def fetch_page(cursor, table, order_column, columns='*', after=None, before=None,
+               start_date=None, end_date=None, page_size=DEFAULT_PAGE_SIZE, placeholder='?', filters=None):
+    """Fetch one page of ``table`` newest first, driven by the order_column index
+
+    ``after`` continues to older rows and ``before`` goes back to newer ones;
+    both are tokens returned in a previous page. ``filters`` maps columns to
+    values they must equal. Returns a dict with ``rows``, ``next_cursor``
+    (older) and ``prev_cursor`` (newer).
+    """
+    conditions, params = date_range_clause(order_column, start_date, end_date, placeholder)
+    for column, value in (filters or {}).items():
+        conditions.append(f'{column} = {placeholder}')
+        params.append(value)
+
+    after_position = decode_cursor(after)
+    before_position = decode_cursor(before) if not after_position else None
+
+    if before_position:
+        conditions.append(f'({order_column}, id) > ({placeholder}, {placeholder})')
+        params.extend(before_position)
+        direction = 'ASC'
+    else:
+        if after_position:
+            conditions.append(f'({order_column}, id) < ({placeholder}, {placeholder})')
+            params.extend(after_position)
+        direction = 'DESC'
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    # One extra row tells us whether another page exists in this direction
+    cursor.execute(f'''
+        SELECT {columns} FROM {table} {where}
+        ORDER BY {order_column} {direction}, id {direction}
+        LIMIT {placeholder}
+    ''', params + [page_size + 1])
+    rows = list(cursor.fetchall())
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if before_position:
+        rows.reverse()
+        prev_cursor = _row_cursor(rows[0], order_column) if has_more and rows else None
+        next_cursor = _row_cursor(rows[-1], order_column) if rows else None
+    else:
+        next_cursor = _row_cursor(rows[-1], order_column) if has_more else None
+        prev_cursor = _row_cursor(rows[0], order_column) if after_position and rows else None
+
+    return {'rows': rows, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+
+
+def _row_cursor(row, order_column):
+    return encode_cursor(row[order_column], row['id'])
@@ -0,0 +1,174 @@
+"""Result cache for the SQLite catalog and list queries.
+
+Pages such as items, sales and investment re-ran the same full-table
+SELECTs on every request although stock_items only changes on add/sell.
+``cached_query`` keeps results keyed by SQL and parameters together with
+the versions of the tables the query reads. Every write path calls
+``bump(cursor, table, ...)`` in the same transaction as its write, which
+increments that table's row in ``table_versions``; a cached result whose
+table versions no longer match is simply recomputed.
+
+The versions live in the database so every gunicorn worker sees every
+other worker's writes. Readers do not re-read them per request: SQLite's
+``PRAGMA data_version`` changes only when another connection commits, so
+between writes a cache hit costs that pragma and a dict lookup. Results
+are evicted least-recently-used once they exceed ``QUERY_CACHE_MAX_BYTES``.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+class QueryCache:
+    """LRU cache of query results, invalidated by per-table versions"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (versions, value, size)
+        self._bytes = 0
+
+        # Last table versions (and their change times) read from the database,
+        # shared by all threads
+        self._versions = {}
+        self._updated = {}
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def query(self, cursor, tables, sql, params=()):
+        """Return cursor.execute(sql, params).fetchall(), from the cache when current"""
+        conn = cursor.connection
+        if conn.in_transaction:
+            # Uncommitted writes may be visible here; never cache or serve them
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+        def run():
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+        return self.memoize(conn, tables, (sql, tuple(params)), run)
+
+    def memoize(self, conn, tables, key, build):
+        """Return the cached value for key while tables are unchanged, else build() it"""
+        versions = self.versions(conn, tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = build()
+        self._store(key, versions, value)
+        return value
+
+    def versions(self, conn, tables):
+        """Return the current versions of tables as a tuple"""
+        return self.state(conn, tables)[0]
+
+    def state(self, conn, tables):
+        """Return (versions, last_modified) for tables; last_modified is a UTC 'YYYY-MM-DD HH:MM:SS' or None"""
+        self._refresh(conn)
+        with self._lock:
+            versions = tuple(self._versions.get(table, 0) for table in tables)
+            updated = [self._updated[table] for table in tables if table in self._updated]
+        return versions, max(updated) if updated else None
+
+    def invalidate(self):
+        """Make the next read on any connection reload the table versions"""
+        with self._lock:
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0,
+                'evictions': self.evictions,
+            }
+
+    def _refresh(self, conn):
+        # A connection needs to re-read versions when another connection has
+        # committed (data_version moved) or a write on this process was made
+        # through it (bump() moved the generation; its own commits do not
+        # change its data_version)
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        seen = getattr(conn, '_query_cache_seen', None)
+        with self._lock:
+            generation = self._generation
+        if seen == (data_version, generation):
+            return
+
+        rows = conn.execute('SELECT table_name, version, updated_at FROM table_versions').fetchall()
+        with self._lock:
+            # Versions only grow; a slower thread must not roll the map back
+            for table, version, updated_at in rows:
+                if version > self._versions.get(table, 0):
+                    self._versions[table] = version
+                    self._updated[table] = updated_at
+        conn._query_cache_seen = (data_version, generation)
+
+    def _store(self, key, versions, value):
+        size = _estimate_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (versions, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+
+def _estimate_size(key, value):
+    # Rough memory footprint: the values themselves plus per-row overhead
+    if isinstance(value, str):
+        return sys.getsizeof(key[0]) + sys.getsizeof(value)
+    size = sys.getsizeof(key[0]) + 64 * (len(value) + 1)
+    for row in value:
+        for field in row:
+            size += sys.getsizeof(field)
+    return size
+
+
+cache = QueryCache(int(os.environ.get('QUERY_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+
+
+def cached_query(cursor, tables, sql, params=()):
+    """Run a SELECT that reads only tables through the shared cache"""
+    return cache.query(cursor, tables, sql, params)
+
+
+def bump(cursor, *tables):
+    """Record a write to tables; call in the same transaction as the write"""
+    cursor.executemany('''
+        INSERT INTO table_versions (table_name, version) VALUES (?, 1)
+        ON CONFLICT (table_name) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    ''', [(table,) for table in tables])
+    cache.invalidate()
+
+
+def stats():
+    return cache.stats()
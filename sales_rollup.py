@@ -0,0 +1,259 @@
+"""Daily sales rollup and the revenue report built on it.
+
+Revenue per day, week or month used to mean grouping the whole ``sales``
+table by ``sold_at``. ``sales_daily`` holds one row per day, item and
+seller with the number of sales, units and revenue, and
+``item_sales_totals`` holds each item's running units, revenue and last
+sale time. ``record_sales`` folds new sales into both in the same
+transaction that inserts them, so a report over years of history reads
+at most a few rows per day and the velocity report never reads ``sales``.
+
+None of the helpers here commit; the caller owns the transaction.
+
+Run ``python sales_rollup.py rebuild [database_file]`` to recompute the
+rollup and item counters from ``sales`` and print any drift that had
+crept in.
+"""
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+DEFAULT_DATABASE_FILE = '/tmp/stock_monitor.db'
+
+# Period key of a 'YYYY-MM-DD' day column; weeks start on Monday
+PERIODS = {
+    'day': 'day',
+    'week': "date(day, '-6 days', 'weekday 1')",
+    'month': "substr(day, 1, 7)",
+    'year': "substr(day, 1, 4)",
+}
+
+VELOCITY_MAX_DAYS = 365
+VELOCITY_MAX_LIMIT = 100
+
+_ROLLUP_SELECT = '''
+    SELECT date(sold_at) AS day, COALESCE(item_id, 0) AS item_id, COALESCE(user_id, 0) AS user_id,
+           MAX(item_name) AS item_name, MAX(user_name) AS user_name, COUNT(*) AS sales_count,
+           COALESCE(SUM(quantity_sold), 0) AS units, COALESCE(SUM(total_amount), 0) AS revenue
+    FROM sales
+    WHERE {where} AND sold_at IS NOT NULL
+    GROUP BY date(sold_at), COALESCE(item_id, 0), COALESCE(user_id, 0)
+'''
+
+_ITEM_TOTALS_SELECT = '''
+    SELECT item_id, COUNT(*) AS sales_count, COALESCE(SUM(quantity_sold), 0) AS units_sold,
+           COALESCE(SUM(total_amount), 0) AS revenue, MAX(sold_at) AS last_sold_at
+    FROM sales
+    WHERE {where} AND item_id IS NOT NULL
+    GROUP BY item_id
+'''
+
+
+def record_sales(cursor, first_sale_id, last_sale_id=None):
+    """Fold the sales with ids first_sale_id..last_sale_id into sales_daily and the item counters"""
+    last_sale_id = last_sale_id or first_sale_id
+    cursor.execute(f'''
+        INSERT INTO sales_daily (day, item_id, user_id, item_name, user_name, sales_count, units, revenue)
+        {_ROLLUP_SELECT.format(where='id BETWEEN ? AND ?')}
+        ON CONFLICT (day, item_id, user_id) DO UPDATE SET
+            sales_count = sales_count + excluded.sales_count,
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue,
+            item_name = excluded.item_name,
+            user_name = excluded.user_name
+    ''', (first_sale_id, last_sale_id))
+    cursor.execute(f'''
+        INSERT INTO item_sales_totals (item_id, sales_count, units_sold, revenue, last_sold_at)
+        {_ITEM_TOTALS_SELECT.format(where='id BETWEEN ? AND ?')}
+        ON CONFLICT (item_id) DO UPDATE SET
+            sales_count = sales_count + excluded.sales_count,
+            units_sold = units_sold + excluded.units_sold,
+            revenue = revenue + excluded.revenue,
+            last_sold_at = MAX(COALESCE(last_sold_at, ''), excluded.last_sold_at)
+    ''', (first_sale_id, last_sale_id))
+
+
+def revenue_report(cursor, period='day', start_date=None, end_date=None, item_id=None, user_id=None):
+    """Units, revenue and average price per period from the rollup
+
+    Dates are inclusive 'YYYY-MM-DD' strings. Returns a dict with ``rows``
+    (newest period first) and ``totals``.
+    """
+    period_sql = PERIODS.get(period, PERIODS['day'])
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append('day >= ?')
+        params.append(start_date)
+    if end_date:
+        conditions.append('day <= ?')
+        params.append(end_date)
+    if item_id is not None:
+        conditions.append('item_id = ?')
+        params.append(item_id)
+    if user_id is not None:
+        conditions.append('user_id = ?')
+        params.append(user_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    cursor.execute(f'''
+        SELECT {period_sql} AS period, SUM(sales_count) AS sales_count,
+               SUM(units) AS units, SUM(revenue) AS revenue
+        FROM sales_daily {where}
+        GROUP BY period
+        ORDER BY period DESC
+    ''', params)
+    rows = [_with_average(dict(zip(('period', 'sales_count', 'units', 'revenue'), row)))
+            for row in cursor.fetchall()]
+
+    totals = _with_average({
+        'period': 'Total',
+        'sales_count': sum(r['sales_count'] for r in rows),
+        'units': sum(r['units'] for r in rows),
+        'revenue': sum(r['revenue'] for r in rows),
+    })
+    return {'rows': rows, 'totals': totals}
+
+
+def sales_totals(cursor):
+    """Count, revenue and units of all sales ever, from the rollup"""
+    cursor.execute('''
+        SELECT COALESCE(SUM(sales_count), 0) AS count, COALESCE(SUM(revenue), 0) AS revenue,
+               COALESCE(SUM(units), 0) AS units
+        FROM sales_daily
+    ''')
+    return cursor.fetchone()
+
+
+def _with_average(row):
+    row['average_price'] = row['revenue'] / row['units'] if row['units'] else 0
+    return row
+
+
+def default_start(period, end=None):
+    """A sensible first day for a report that gives none: 30 days, 12 weeks, 12 months or 5 years back"""
+    end = end or datetime.utcnow()
+    days = {'day': 29, 'week': 7 * 12, 'month': 365, 'year': 5 * 365}.get(period, 29)
+    return (end - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def velocity_report(cursor, end_date, days=30, limit=10):
+    """Fastest and slowest selling items over the ``days`` days ending on end_date
+
+    ``top`` ranks items by units sold in the window. ``bottom`` lists the
+    items still in stock that sold the fewest units, those unsold longest
+    first. Each row carries the window's units, revenue and units per day,
+    the item's lifetime counters and how many days its stock would last
+    at the current pace.
+    """
+    days = max(1, min(days, VELOCITY_MAX_DAYS))
+    limit = max(1, min(limit, VELOCITY_MAX_LIMIT))
+    start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    # Read the window by day; "+item_id" keeps SQLite from skip-scanning
+    # idx_sales_daily_item across every item just to get rows in item order
+    window = '''
+        SELECT item_id, MAX(item_name) AS item_name, SUM(units) AS units, SUM(revenue) AS revenue
+        FROM sales_daily
+        WHERE day BETWEEN ? AND ? AND item_id != 0
+        GROUP BY +item_id
+    '''
+    columns = '''
+        COALESCE(s.name, w.item_name) AS name, s.quantity, COALESCE(w.units, 0) AS units,
+        COALESCE(w.revenue, 0) AS revenue, t.units_sold, t.revenue AS lifetime_revenue, t.last_sold_at
+    '''
+
+    # Only the top few items of the window are joined
+    cursor.execute(f'''
+        SELECT w.item_id AS id, {columns}
+        FROM ({window} ORDER BY units DESC, revenue DESC LIMIT ?) w
+        LEFT JOIN stock_items s ON s.id = w.item_id
+        LEFT JOIN item_sales_totals t ON t.item_id = w.item_id
+        ORDER BY units DESC, revenue DESC
+    ''', (start_date, end_date, limit))
+    top = [_with_velocity(dict(zip([d[0] for d in cursor.description], row)), days)
+           for row in cursor.fetchall()]
+
+    # The slowest items usually sold nothing in the window at all; the counters
+    # find those (never sold first, then longest unsold) without aggregating it
+    order = 'ORDER BY units, t.last_sold_at IS NOT NULL, t.last_sold_at, s.id LIMIT ?'
+    cursor.execute(f'''
+        SELECT s.id, s.name, s.quantity, 0 AS units, 0 AS revenue, t.units_sold,
+               t.revenue AS lifetime_revenue, t.last_sold_at
+        FROM stock_items s
+        LEFT JOIN item_sales_totals t ON t.item_id = s.id
+        WHERE s.quantity > 0 AND (t.last_sold_at IS NULL OR t.last_sold_at < ?)
+        {order}
+    ''', (start_date, limit))
+    bottom = cursor.fetchall()
+    if len(bottom) < limit:
+        # Everything in stock sold recently; rank by units in the window
+        cursor.execute(f'''
+            SELECT s.id, {columns}
+            FROM stock_items s
+            LEFT JOIN ({window}) w ON w.item_id = s.id
+            LEFT JOIN item_sales_totals t ON t.item_id = s.id
+            WHERE s.quantity > 0
+            {order}
+        ''', (start_date, end_date, limit))
+        bottom = cursor.fetchall()
+    bottom = [_with_velocity(dict(zip([d[0] for d in cursor.description], row)), days) for row in bottom]
+
+    return {'start_date': start_date, 'end_date': end_date, 'days': days, 'top': top, 'bottom': bottom}
+
+
+def _with_velocity(row, days):
+    row['per_day'] = row['units'] / days
+    row['days_of_stock'] = row['quantity'] / row['per_day'] if row['per_day'] and row['quantity'] else None
+    return row
+
+
+# table -> (query recomputing it from sales, columns compared for drift)
+_REBUILT_TABLES = {
+    'sales_daily': (_ROLLUP_SELECT, 'day, item_id, user_id, sales_count, units, ROUND(revenue, 2)'),
+    'item_sales_totals': (_ITEM_TOTALS_SELECT, 'item_id, sales_count, units_sold, ROUND(revenue, 2), last_sold_at'),
+}
+
+
+def rebuild(conn):
+    """Recompute sales_daily and item_sales_totals from sales; returns the number of rows that had drifted"""
+    cursor = conn.cursor()
+    # Hold the write lock so no sale lands between reading sales and replacing the rollup
+    cursor.execute('BEGIN IMMEDIATE')
+    drifted = 0
+    for table, (select, compared) in _REBUILT_TABLES.items():
+        fresh = f'fresh_{table}'
+        cursor.execute(f'CREATE TEMP TABLE {fresh} AS {select.format(where="1")}')
+        # Rows that are wrong, missing or left over, in either direction
+        for stored, actual in ((table, fresh), (fresh, table)):
+            cursor.execute(f'SELECT COUNT(*) FROM (SELECT {compared} FROM {stored} '
+                           f'EXCEPT SELECT {compared} FROM {actual})')
+            drifted += cursor.fetchone()[0]
+
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {fresh}')
+        cursor.execute(f'DROP TABLE {fresh}')
+    conn.commit()
+    return drifted
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'rebuild':
+        print(f"Usage: python {argv[0]} rebuild [database_file]")
+        return 2
+
+    database_file = argv[2] if len(argv) > 2 else DEFAULT_DATABASE_FILE
+    conn = sqlite3.connect(database_file)
+    try:
+        drifted = rebuild(conn)
+    finally:
+        conn.close()
+
+    if drifted:
+        print(f"Sales rollup for {database_file} had {drifted} drifted rows and was rebuilt")
+        return 1
+    print(f"Sales rollup for {database_file} is accurate, no drift found")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
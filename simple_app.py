@@ -4,6 +4,10 @@ from flask import Flask, render_template, request, redirect, url_for, session, f
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import secrets
+import sqlite_db
+import migrate
+import assets
+import compression
 
 app = Flask(__name__)
 
@@ -11,43 +15,19 @@ app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'stock-monitor-secret-2024-chethan81-production-key-1234567890')
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 
-# Simple in-memory database for Render compatibility
+# Simple persistent database for Render compatibility
+DATABASE_FILE = '/tmp/database.db'
+sqlite_db.init_app(app, DATABASE_FILE)
+assets.init_app(app)
+compression.init_app(app)
+
 def get_db():
-    try:
-        # Try to create a persistent database
-        conn = sqlite3.connect('/tmp/database.db')
-        conn.row_factory = sqlite3.Row
-        return conn
-    except:
-        # Fallback to in-memory database
-        conn = sqlite3.connect(':memory:')
-        conn.row_factory = sqlite3.Row
-        return conn
+    """Get this request's database connection (a warm per-thread connection)"""
+    return sqlite_db.get_db()
 
 def init_db():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password_hash TEXT,
-            email TEXT,
-            created_at TEXT
-        )
-    ''')
-    
-    # Create admin user if not exists
-    cursor.execute('SELECT * FROM users WHERE username = ?', ('admin',))
-    if not cursor.fetchone():
-        hashed_password = generate_password_hash('admin123')
-        cursor.execute('INSERT INTO users (username, password_hash, email, created_at) VALUES (?, ?, ?, ?)', 
-                      ('admin', hashed_password, 'admin@stockmonitor.com', datetime.now().isoformat()))
-    
-    conn.commit()
-    conn.close()
+    """Apply pending schema migrations (a single version check on warm starts)"""
+    migrate.migrate_sqlite(DATABASE_FILE)
 
 # Initialize database
 init_db()
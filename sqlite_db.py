@@ -0,0 +1,109 @@
+"""Connection management for the SQLite apps.
+
+Every request used to open a fresh ``sqlite3.connect()`` (and some helpers
+opened one per statement), paying file open, schema parse and PRAGMA setup
+each time. Here each thread keeps one warm connection per database file
+with a large statement cache, PRAGMAs are applied once when it is opened,
+and Flask's app context hands the same connection to everything in a
+request, rolling back anything left uncommitted at teardown.
+
+Connections are ``PooledConnection`` objects: route code can keep calling
+``conn.close()`` when it is done and the connection stays open for reuse.
+
+The first connection to a database file switches it to WAL mode, which
+is stored in the file, so readers (a long CSV export, say) and writers
+stop blocking each other.
+"""
+import os
+import sqlite3
+import threading
+
+from flask import g, has_app_context, current_app
+
+STATEMENT_CACHE_SIZE = 256
+
+# Applied once per connection, not per request
+PRAGMAS = (
+    ('busy_timeout', 5000),
+    ('cache_size', -8000),  # 8 MB page cache
+    ('temp_store', 'MEMORY'),
+)
+
+_local = threading.local()
+_default_database = None
+
+
+class PooledConnection(sqlite3.Connection):
+    """A connection whose close() returns it for reuse instead of closing it"""
+
+    def close(self):
+        # Discard anything the caller forgot to commit so the next user
+        # starts clean, but keep the connection (and its caches) warm
+        if self.in_transaction:
+            self.rollback()
+
+    def close_for_real(self):
+        super().close()
+
+
+def init_app(app, database_file):
+    """Register database_file as the app's database and release connections at teardown"""
+    global _default_database
+    app.config['DATABASE_FILE'] = database_file
+    _default_database = database_file
+    app.teardown_appcontext(_release_connection)
+
+
+def connect(database_file):
+    """Open a new tuned connection; most callers want get_db() instead"""
+    conn = sqlite3.connect(database_file, factory=PooledConnection,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    _use_wal(conn)
+    return conn
+
+
+def _use_wal(conn):
+    # Switching needs an exclusive lock, so only try when the file is not in WAL yet
+    if conn.execute('PRAGMA journal_mode').fetchone()[0] in ('wal', 'memory'):
+        return
+    try:
+        conn.execute('PRAGMA journal_mode = WAL')
+    except sqlite3.OperationalError as e:
+        # Busy right now; the next connection opened will try again
+        print(f"Could not switch the database to WAL mode: {e}")
+
+
+def thread_connection(database_file=None):
+    """Return this thread's warm connection to database_file, opening it if needed"""
+    database_file = database_file or _default_database
+    connections = getattr(_local, 'connections', None)
+
+    # A connection inherited across fork() must never be used by the child
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    conn = connections.get(database_file)
+    if conn is None:
+        conn = connections[database_file] = connect(database_file)
+    return conn
+
+
+def get_db():
+    """Return the connection for the current request (or thread, outside a request)"""
+    if not has_app_context():
+        return thread_connection()
+
+    conn = g.get('_sqlite_db')
+    if conn is None:
+        conn = g._sqlite_db = thread_connection(current_app.config['DATABASE_FILE'])
+    return conn
+
+
+def _release_connection(exception=None):
+    conn = g.pop('_sqlite_db', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
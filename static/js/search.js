@@ -0,0 +1,39 @@
+// Search-as-you-type for the header search box: fills its datalist with
+// matching item names from /search/autocomplete
+(function () {
+    var input = document.getElementById('item-search');
+    var list = document.getElementById('item-search-suggestions');
+    if (!input || !list) {
+        return;
+    }
+
+    var timer = null;
+    var latest = 0;
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (query.length < 2) {
+            list.innerHTML = '';
+            return;
+        }
+        // Wait for a pause in typing rather than asking on every key
+        timer = setTimeout(function () {
+            var request = ++latest;
+            fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query), {credentials: 'same-origin'})
+                .then(function (response) { return response.ok ? response.json() : []; })
+                .then(function (items) {
+                    if (request !== latest) {
+                        return;  // a newer query has been sent
+                    }
+                    list.innerHTML = '';
+                    items.forEach(function (item) {
+                        var option = document.createElement('option');
+                        option.value = item.name;
+                        list.appendChild(option);
+                    });
+                })
+                .catch(function () {});
+        }, 150);
+    });
+})();
@@ -0,0 +1,162 @@
+"""Low-stock alerts raised on the sale and add paths.
+
+Each stock item has a ``reorder_level``; when its quantity is at or below
+it the item has exactly one row in ``stock_alerts`` (``low``, or ``out``
+at zero). Nothing sweeps ``stock_items`` looking for low stock: the write
+paths in inventory.py and item_import.py call ``check_items`` with the
+ids they just changed, which re-evaluates only those rows by primary key.
+An item that drops below its level raises an alert, one that is restocked
+or given a lower level clears it, and repeated sales of a low item just
+update the existing alert.
+
+``init_app`` adds the ``/alerts`` page, the ``/alerts/feed`` JSON feed,
+the reorder-level form and a ``stock_alert_count()`` template global for
+the navigation badge. ``stock_alerts`` has its own table version, bumped
+only when an alert is raised, escalated or cleared, so the count is
+served from the query cache across ordinary sales.
+
+None of the helpers here commit; the caller owns the transaction.
+"""
+from flask import abort, flash, jsonify, redirect, render_template, request, session, url_for
+
+import http_cache
+import query_cache
+import sqlite_db
+
+MAX_FEED_ALERTS = 200
+
+ALERT_FIELDS = ('item_id', 'item_name', 'quantity', 'reorder_level', 'level', 'raised_at')
+
+
+def check_items(cursor, item_ids):
+    """Raise, update or clear the alerts of the given stock items"""
+    item_ids = list(item_ids)
+    if item_ids:
+        _check(cursor, f"id IN ({','.join('?' * len(item_ids))})", item_ids)
+
+
+def check_item_range(cursor, first_item_id, last_item_id):
+    """check_items for a consecutive block of ids, such as an import batch"""
+    _check(cursor, 'id BETWEEN ? AND ?', [first_item_id, last_item_id])
+
+
+def _check(cursor, where, params):
+    before = _levels(cursor, where, params)
+    # raised_at marks when the item reached its current level, so a low item
+    # selling out shows as a new alert while another sale at 'low' does not
+    cursor.execute(f'''
+        INSERT INTO stock_alerts (item_id, item_name, quantity, reorder_level, level)
+        SELECT id, name, quantity, reorder_level, CASE WHEN quantity <= 0 THEN 'out' ELSE 'low' END
+        FROM stock_items
+        WHERE {where} AND quantity <= reorder_level
+        ON CONFLICT (item_id) DO UPDATE SET
+            item_name = excluded.item_name,
+            quantity = excluded.quantity,
+            reorder_level = excluded.reorder_level,
+            raised_at = CASE WHEN level = excluded.level THEN raised_at ELSE CURRENT_TIMESTAMP END,
+            level = excluded.level
+    ''', params)
+    cursor.execute(f'''
+        DELETE FROM stock_alerts
+        WHERE item_id IN (SELECT id FROM stock_items WHERE {where} AND quantity > reorder_level)
+    ''', params)
+    # Another sale of an item that is already low changes no alert; only a
+    # raised, escalated or cleared alert needs the badge on every page redrawn
+    if _levels(cursor, where, params) != before:
+        query_cache.bump(cursor, 'stock_alerts')
+
+
+def _levels(cursor, where, params):
+    cursor.execute(f'''
+        SELECT item_id, level FROM stock_alerts
+        WHERE item_id IN (SELECT id FROM stock_items WHERE {where})
+        ORDER BY item_id
+    ''', params)
+    return cursor.fetchall()
+
+
+def set_reorder_level(cursor, item_id, reorder_level):
+    """Change an item's reorder level and re-evaluate its alert; returns False if there is no such item"""
+    cursor.execute('UPDATE stock_items SET reorder_level = ? WHERE id = ?', (reorder_level, item_id))
+    if cursor.rowcount == 0:
+        return False
+    check_items(cursor, [item_id])
+    query_cache.bump(cursor, 'stock_items')
+    return True
+
+
+def open_alerts(cursor, since=None, limit=MAX_FEED_ALERTS):
+    """Current alerts, newest first; ``since`` keeps those raised after that timestamp"""
+    where = 'WHERE raised_at > ?' if since else ''
+    cursor.execute(f'''
+        SELECT {', '.join(ALERT_FIELDS)} FROM stock_alerts {where}
+        ORDER BY level = 'out' DESC, raised_at DESC, item_id
+        LIMIT ?
+    ''', ([since] if since else []) + [limit])
+    return [dict(zip(ALERT_FIELDS, row)) for row in cursor.fetchall()]
+
+
+def alert_count(cursor):
+    """Number of items with an open alert"""
+    return query_cache.cached_query(cursor, ('stock_alerts',), 'SELECT COUNT(*) FROM stock_alerts')[0][0]
+
+
+def init_app(app, run=None):
+    """Register the alert page, feed, reorder-level form and badge
+
+    run(op, *args) performs a write; by default ops run on the request's
+    connection and are committed straight away.
+    """
+    run = run or _run_and_commit
+    # The badge is on every page, so every page's ETag has to follow it
+    http_cache.add_page_tables('stock_alerts')
+
+    @http_cache.conditional('stock_items')
+    def stock_alerts():
+        if 'user_id' not in session:
+            return redirect(url_for('login'))
+        alerts = open_alerts(sqlite_db.get_db().cursor())
+        return render_template('stock_alerts.html', alerts=alerts, is_admin=session.get('username') == 'admin')
+
+    @http_cache.conditional('stock_items')
+    def stock_alerts_feed():
+        if 'user_id' not in session:
+            return jsonify({'error': 'Login required'}), 401
+        cursor = sqlite_db.get_db().cursor()
+        alerts = open_alerts(cursor, request.args.get('since'), request.args.get('limit', MAX_FEED_ALERTS, type=int))
+        return jsonify({'count': alert_count(cursor), 'alerts': alerts})
+
+    def set_item_reorder_level(id):
+        if 'user_id' not in session:
+            return redirect(url_for('login'))
+        if session.get('username') != 'admin':
+            abort(403)
+        reorder_level = request.form.get('reorder_level', type=int)
+        if reorder_level is None or reorder_level < 0:
+            flash('Reorder level must be a whole number of 0 or more', 'error')
+        elif run(set_reorder_level, id, reorder_level):
+            flash(f'Reorder level set to {reorder_level}', 'success')
+        else:
+            flash('Item not found', 'error')
+        # Back to the page the form was on, but never off this site
+        next_url = request.form.get('next', '')
+        if not next_url.startswith('/') or next_url.startswith('//'):
+            next_url = url_for('stock_alerts')
+        return redirect(next_url)
+
+    app.add_url_rule('/alerts', 'stock_alerts', stock_alerts)
+    app.add_url_rule('/alerts/feed', 'stock_alerts_feed', stock_alerts_feed)
+    app.add_url_rule('/items/<int:id>/reorder-level', 'set_item_reorder_level', set_item_reorder_level,
+                     methods=['POST'])
+    app.jinja_env.globals['stock_alert_count'] = lambda: alert_count(sqlite_db.get_db().cursor())
+
+
+def _run_and_commit(op, *args):
+    conn = sqlite_db.get_db()
+    try:
+        result = op(conn.cursor(), *args)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
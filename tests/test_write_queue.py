@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+
+import pytest
+
+import write_queue
+
+
+@pytest.fixture
+def database_file(tmp_path):
+    path = str(tmp_path / 'stock.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE stock (id INTEGER PRIMARY KEY, quantity INTEGER NOT NULL)')
+    conn.execute('INSERT INTO stock (id, quantity) VALUES (1, 10)')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _quantity(database_file):
+    conn = sqlite3.connect(database_file)
+    try:
+        return conn.execute('SELECT quantity FROM stock WHERE id = 1').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _sell(cursor, quantity):
+    cursor.execute('UPDATE stock SET quantity = quantity - ? WHERE id = 1', (quantity,))
+    return quantity
+
+
+def test_run_returns_committed_result(database_file):
+    writer = write_queue.GroupCommitWriter(database_file)
+    try:
+        assert writer.run(_sell, 3) == 3
+    finally:
+        writer.stop()
+    assert _quantity(database_file) == 7
+
+
+def test_timed_out_write_never_commits(database_file):
+    writer = write_queue.GroupCommitWriter(database_file, max_latency=0)
+    started, release = threading.Event(), threading.Event()
+
+    def block(cursor):
+        started.set()
+        release.wait(5)
+
+    try:
+        # Hold the writer thread inside a batch so the sale stays queued
+        blocker = writer.submit(block)
+        assert started.wait(5)
+        with pytest.raises(TimeoutError, match='nothing was saved'):
+            writer.run(_sell, 2, timeout=0.05)
+        release.set()
+        blocker.result(5)
+        # A later write still goes through, and the timed-out one is gone
+        assert writer.run(_sell, 1) == 1
+    finally:
+        release.set()
+        writer.stop()
+    assert _quantity(database_file) == 9
+
+
+def test_running_write_is_awaited_past_the_timeout(database_file):
+    writer = write_queue.GroupCommitWriter(database_file)
+    release = threading.Event()
+
+    def slow_sell(cursor):
+        release.wait(5)
+        return _sell(cursor, 4)
+
+    try:
+        threading.Timer(0.1, release.set).start()
+        # Already running when the timeout hits, so the caller gets its result
+        assert writer.run(slow_sell, timeout=0.05) == 4
+    finally:
+        release.set()
+        writer.stop()
+    assert _quantity(database_file) == 6
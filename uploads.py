@@ -0,0 +1,259 @@
+"""Streaming ingestion of camera captures.
+
+The camera forms used to put the capture into a hidden ``imageData``
+field as a base64 data URL, so a registration POST carried the photo
+inflated by a third and Werkzeug held the whole form, the decoded bytes
+and the base64 text in memory at once. Instead the page now POSTs the
+data URL to ``/upload/camera`` as soon as it is captured. The body is
+read from the request stream in small chunks, decoded incrementally into
+a temporary file and rejected as soon as it passes the byte cap or its
+header shows oversized dimensions. The response is an opaque handle the
+form submits in ``imageHandle``; ``claim()`` moves the file into place.
+
+A raw image body (``Content-Type: image/...``) is stored the same way
+without decoding.
+
+Pending files wait outside ``static/`` (in ``PENDING_UPLOAD_FOLDER``, by
+default the app's instance folder), so nothing is served until ``claim()``
+moves it. The endpoint needs no login because registration uses it, so
+the pending folder is capped: past ``PENDING_MAX_FILES`` files an upload
+gets 429, past ``PENDING_MAX_BYTES`` it gets 507. Handles that are never
+claimed are removed after ``PENDING_TTL`` seconds.
+"""
+import base64
+import binascii
+import glob
+import io
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from flask import current_app, request, jsonify
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+MAX_BYTES = int(os.environ.get('CAMERA_UPLOAD_MAX_BYTES', 8 * 1024 * 1024))
+MAX_DIMENSION = int(os.environ.get('CAMERA_UPLOAD_MAX_DIMENSION', 6000))
+PENDING_TTL = 60 * 60
+PENDING_MAX_FILES = int(os.environ.get('CAMERA_UPLOAD_PENDING_MAX_FILES', 200))
+PENDING_MAX_BYTES = int(os.environ.get('CAMERA_UPLOAD_PENDING_MAX_BYTES', 256 * 1024 * 1024))
+HEADER_LIMIT = 256 * 1024  # give up looking for the image size after this many bytes
+
+# Leading bytes of the formats the upload forms accept
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'RIFF', 'webp'),
+)
+
+_HANDLE = re.compile(r'^[0-9a-f]{32}$')
+_WHITESPACE = re.compile(rb'\s+')
+
+
+class UploadRejected(Exception):
+    """The upload is too large, malformed or not an image"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def init_app(app):
+    """Register the /upload/camera endpoint"""
+    app.config.setdefault('PENDING_UPLOAD_FOLDER', os.environ.get(
+        'CAMERA_UPLOAD_PENDING_FOLDER', os.path.join(app.instance_path, 'pending_uploads')))
+    app.add_url_rule('/upload/camera', 'upload_camera', upload_camera, methods=['POST'])
+
+
+def upload_camera():
+    folder = _pending_folder()
+    _remove_expired(folder)
+    try:
+        check_capacity(folder, request.content_length)
+        handle = receive(request.stream, request.content_type or '', request.content_length, folder)
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'handle': handle})
+
+
+def check_capacity(folder, content_length=None):
+    """Raise UploadRejected if folder has no room for another upload"""
+    files = glob.glob(os.path.join(folder, '*'))
+    if len(files) >= PENDING_MAX_FILES:
+        raise UploadRejected('Too many pending uploads, try again later', 429)
+    used = 0
+    for path in files:
+        try:
+            # An upload still in progress may grow to the full cap
+            used += MAX_BYTES if path.endswith('.part') else os.path.getsize(path)
+        except OSError:
+            pass
+    if used + min(content_length or MAX_BYTES, MAX_BYTES) > PENDING_MAX_BYTES:
+        raise UploadRejected('Upload storage is full, try again later', 507)
+
+
+def receive(stream, content_type, content_length, folder):
+    """Store an image read from stream in folder; returns its handle"""
+    raw = content_type.startswith('image/')
+    # Refuse obviously oversized bodies before reading any of them
+    limit = MAX_BYTES if raw else (MAX_BYTES + 2) // 3 * 4 + 256
+    if content_length is not None and content_length > limit:
+        raise UploadRejected('Image is too large', 413)
+
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            extension = _copy(stream, out, raw)
+        handle = secrets.token_hex(16)
+        os.replace(temp_path, os.path.join(folder, f'{handle}.{extension}'))
+        return handle
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def claim(handle, prefix, upload_folder):
+    """Move a pending upload into upload_folder; returns its path, or None for an unknown handle"""
+    if not handle or not _HANDLE.match(handle):
+        return None
+    matches = [path for path in glob.glob(os.path.join(_pending_folder(), f'{handle}.*'))
+               if not path.endswith('.claimed')]
+    if not matches:
+        return None
+
+    extension = os.path.splitext(matches[0])[1]
+    # Rename in place first so only one of two concurrent claims gets the file
+    taken = f'{matches[0]}.claimed'
+    try:
+        os.replace(matches[0], taken)
+    except FileNotFoundError:
+        return None  # claimed by a concurrent request
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(upload_folder, f'{prefix}_{timestamp}_{handle[:8]}_camera{extension}')
+    try:
+        # The pending folder may be on another filesystem than static/
+        shutil.move(taken, path)
+    except OSError:
+        os.replace(taken, matches[0])
+        raise
+    return path
+
+
+def _copy(stream, out, raw):
+    # Returns the extension of the image written to out
+    written = 0
+    carry = b''
+    header = _HeaderCheck()
+    prefix_seen = raw
+
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+
+        if raw:
+            data = chunk
+        else:
+            chunk = carry + _WHITESPACE.sub(b'', chunk)
+            if not prefix_seen:
+                if len(chunk) < 256 and b',' not in chunk:
+                    carry = chunk
+                    continue
+                # Drop a 'data:image/jpeg;base64,' prefix
+                if chunk.startswith(b'data:'):
+                    comma = chunk.find(b',', 0, 256)
+                    if comma < 0:
+                        raise UploadRejected('Malformed data URL')
+                    chunk = chunk[comma + 1:]
+                prefix_seen = True
+            # Decode whole 4-character groups only; keep the rest for the next chunk
+            usable = len(chunk) - len(chunk) % 4
+            chunk, carry = chunk[:usable], chunk[usable:]
+            try:
+                data = base64.b64decode(chunk, validate=True)
+            except binascii.Error:
+                raise UploadRejected('Image data is not valid base64')
+
+        written += len(data)
+        if written > MAX_BYTES:
+            raise UploadRejected('Image is too large', 413)
+        header.feed(data)
+        out.write(data)
+
+    if carry:
+        raise UploadRejected('Image data is truncated')
+    return header.finish()
+
+
+class _HeaderCheck:
+    """Identifies the image format and checks its dimensions from its first bytes"""
+
+    def __init__(self):
+        self.head = b''
+        self.extension = None
+        self.size = None
+
+    def feed(self, data):
+        if self.size is not None or (Image is None and self.extension is not None):
+            return
+        self.head += data
+        if len(self.head) > HEADER_LIMIT:
+            raise UploadRejected('Not a supported image', 415)
+        if self.extension is None and len(self.head) >= 12:
+            self.extension = _sniff(self.head)
+        if Image is None or self.extension is None:
+            return
+
+        # Image.open only parses the header; it fails until the size is in head
+        try:
+            with Image.open(io.BytesIO(self.head)) as image:
+                self.size = image.size
+        except Image.DecompressionBombError:
+            raise UploadRejected('Image is too large', 413)
+        except Exception:
+            return
+        self.head = b''
+        if max(self.size) > MAX_DIMENSION:
+            raise UploadRejected(f'Image is larger than {MAX_DIMENSION}px', 413)
+
+    def finish(self):
+        if self.extension is None:
+            self.extension = _sniff(self.head)
+        if Image is not None and self.size is None:
+            raise UploadRejected('Not a supported image', 415)
+        return self.extension
+
+
+def _sniff(head):
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            if extension == 'webp' and head[8:12] != b'WEBP':
+                break
+            return extension
+    raise UploadRejected('Not a supported image', 415)
+
+
+def _pending_folder():
+    folder = current_app.config['PENDING_UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _remove_expired(folder):
+    cutoff = time.time() - PENDING_TTL
+    for path in glob.glob(os.path.join(folder, '*')):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
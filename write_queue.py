@@ -0,0 +1,197 @@
+"""Single-writer group commit for the SQLite apps.
+
+SQLite allows one writer at a time. With several workers each committing
+their own tiny transaction, bursts of sales queue up on the write lock
+and eventually fail with "database is locked", and every commit pays its
+own fsync. ``GroupCommitWriter`` funnels writes through one thread that
+drains a queue and commits everything it collected (up to ``max_batch``
+operations, waiting at most ``max_latency`` seconds for more) in a single
+transaction. Callers block on a future for their own result.
+
+The database runs in WAL mode (sqlite_db switches it) so request threads
+keep reading while the writer commits.
+
+An operation is any ``fn(cursor, *args, **kwargs)`` that does not commit,
+such as ``inventory.sell_stock``. Each runs inside its own SAVEPOINT, so
+an operation that raises is rolled back on its own and its caller gets the
+exception, while the rest of the batch still commits.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import sqlite_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_LATENCY = 0.005  # seconds to wait for more work before committing
+DEFAULT_TIMEOUT = 10  # seconds a caller waits for its write
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Run write operations on one thread and commit them in groups"""
+
+    def __init__(self, database_file, max_batch=DEFAULT_MAX_BATCH, max_latency=DEFAULT_MAX_LATENCY):
+        self.database_file = database_file
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.batches = 0
+        self.operations = 0
+        self.failed_operations = 0
+
+    def submit(self, operation, *args, **kwargs):
+        """Queue operation(cursor, *args, **kwargs) and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((future, operation, args, kwargs))
+        return future
+
+    def run(self, operation, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        """Queue an operation and wait until the batch holding it has committed.
+
+        Raises TimeoutError only if the operation never started, in which
+        case it is withdrawn and will not be written.
+        """
+        future = self.submit(operation, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # Still queued: withdraw it so it cannot commit after we give up
+            if future.cancel():
+                raise TimeoutError(f'Write not started within {timeout}s; nothing was saved') from None
+            # Already in a batch, so its outcome is at most one commit away
+            return future.result()
+
+    def stop(self, timeout=DEFAULT_TIMEOUT):
+        """Commit whatever is queued and stop the writer thread"""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'operations': self.operations,
+            'failed_operations': self.failed_operations,
+            'queued': self._queue.qsize(),
+            'average_batch': (self.operations / self.batches) if self.batches else 0,
+        }
+
+    def _ensure_started(self):
+        # Started lazily so that a gunicorn worker forked from a preloaded
+        # master gets its own thread rather than a dead copy of the master's
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='sqlite-group-commit', daemon=True)
+            self._thread.start()
+
+    def _connect(self):
+        conn = sqlite_db.connect(self.database_file)
+        # Transactions are managed explicitly with BEGIN IMMEDIATE / SAVEPOINT
+        conn.isolation_level = None
+        # In WAL mode NORMAL only fsyncs at checkpoints and stays corruption-safe
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        pending = self._queue
+        try:
+            while True:
+                first = pending.get()
+                if first is _STOP:
+                    return
+
+                batch = [first]
+                stopping = False
+                deadline = time.monotonic() + self.max_latency
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        work = pending.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if work is _STOP:
+                        stopping = True
+                        break
+                    batch.append(work)
+
+                self._commit_batch(conn, batch)
+                if stopping:
+                    return
+        finally:
+            conn.close_for_real()
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for index, (future, operation, args, kwargs) in enumerate(batch):
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = f'op_{index}'
+                cursor.execute(f'SAVEPOINT {savepoint}')
+                try:
+                    result = operation(cursor, *args, **kwargs)
+                except Exception as e:
+                    cursor.execute(f'ROLLBACK TO {savepoint}')
+                    cursor.execute(f'RELEASE {savepoint}')
+                    outcomes.append((future, None, e))
+                else:
+                    cursor.execute(f'RELEASE {savepoint}')
+                    outcomes.append((future, result, None))
+            cursor.execute('COMMIT')
+        except Exception as e:
+            logger.error("Group commit of %d writes failed: %s", len(batch), e)
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self.failed_operations += len(batch)
+            return
+
+        # Only report results once they are durable
+        self.batches += 1
+        for future, result, error in outcomes:
+            self.operations += 1
+            if error is not None:
+                self.failed_operations += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def create_writer(database_file):
+    """Build a writer configured from the environment and stop it cleanly at exit"""
+    writer = GroupCommitWriter(
+        database_file,
+        max_batch=int(os.environ.get('GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH)),
+        max_latency=float(os.environ.get('GROUP_COMMIT_MAX_LATENCY_MS', DEFAULT_MAX_LATENCY * 1000)) / 1000,
+    )
+    atexit.register(writer.stop)
+    return writer